@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -110,6 +111,31 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
+# Password hashing policy. New hashes use the first hasher; the others only
+# verify older hashes. Users whose hash differs from the policy (another
+# algorithm or iteration count) are rehashed on their next login.
+PASSWORD_HASHERS = [
+    'event.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', 1_000_000))
+
+# Sliding-window limits on the unauthenticated auth endpoints, per client IP
+# and per submitted email/username ("count/period", period s, min, h or day).
+# Leave a key out to disable that limit.
+AUTH_THROTTLE_RATES = {
+    'login': {'ip': '30/min', 'identity': '10/min'},
+    'signup': {'ip': '10/h', 'identity': '5/h'},
+}
+
+# Password checks at login run on this many dedicated threads; a login that
+# waits longer than LOGIN_HASH_WAIT seconds for one is answered 503.
+LOGIN_HASH_WORKERS = int(os.getenv('LOGIN_HASH_WORKERS', os.cpu_count() or 2))
+LOGIN_HASH_WAIT = float(os.getenv('LOGIN_HASH_WAIT', 5))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -157,17 +183,66 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Cache
+# A file-based cache in a shared directory by default, so every worker
+# process on the host sees the same entries and version bumps.
+# CACHE_BACKEND / CACHE_LOCATION can point at another backend (e.g. Redis or
+# Memcached) when workers span several hosts.
+# Auth throttle counters live in their own 'throttle' cache, so response
+# caching can never evict them, and it needs an atomic incr: local memory
+# (limits then apply per worker process) or Redis/Memcached to share them.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'yatrusathi-cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'throttle': {
+        'BACKEND': os.getenv('THROTTLE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('THROTTLE_CACHE_LOCATION', 'yatrusathi-throttle'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('THROTTLE_CACHE_MAX_ENTRIES', 100000)),
+        },
+    },
+}
+
+# Event chat WebSockets fan out through this pub/sub backend. The in-process
+# default serves a single ASGI worker; see event/realtime.py for the interface.
+CHAT_PUBSUB_BACKEND = os.getenv('CHAT_PUBSUB_BACKEND', 'event.realtime.InMemoryPubSub')
+
+# Chat of events that ended this many days ago is moved to compressed
+# archive segments by `manage.py archive_chat`
+CHAT_ARCHIVE_AFTER_DAYS = 180
+
+# Notification retention, enforced by `manage.py prune_notifications`
+NOTIFICATION_RETENTION_DAYS = 365
+NOTIFICATION_MAX_PER_USER = 1000
+
+# Per-process token -> user cache used by CachedTokenAuthentication. Logout
+# and user changes invalidate it at once in the handling process; TTL
+# (seconds) bounds staleness in the others.
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': int(os.getenv('TOKEN_AUTH_CACHE_SIZE', 10000)),
+    'TTL': int(os.getenv('TOKEN_AUTH_CACHE_TTL', 60)),
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'event.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # Reverse proxies in front of the app. Throttles key on the client IP
+    # they append to X-Forwarded-For; with 0 the header is ignored and
+    # REMOTE_ADDR is used, so clients cannot pick their own throttle key.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
 }
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Event, ChatMessage, Notification, Profile, Favorite, Booking, Review
+from .models import Event, ChatMessage, Notification, Profile, Favorite, Booking, Review, Tag
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
@@ -8,6 +8,12 @@ class EventAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description', 'location')
     date_hierarchy = 'date'
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'event_count')
+    search_fields = ('slug',)
+    readonly_fields = ('event_count',)
+
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'location', 'phone')
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class EventConfig(AppConfig):
     name = 'event'
+
+    def ready(self):
+        from . import signals  # noqa: F401
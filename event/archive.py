@@ -0,0 +1,125 @@
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import ChatArchiveSegment, ChatMessage, Event
+
+# ----------------------------
+# Chat cold storage
+# ----------------------------
+# Chat of events that ended more than CHAT_ARCHIVE_AFTER_DAYS ago is moved
+# out of the hot ChatMessage table into ChatArchiveSegment rows. The chat
+# endpoint reads segments back only when a window reaches past the hot rows.
+
+SEGMENT_SIZE = 1000
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 180)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_events(cutoff):
+    """Events that ended before `cutoff` and still have hot chat."""
+    return (
+        Event.objects.annotate(ended_at=Coalesce('end_date_time', 'date'))
+        .filter(ended_at__lt=cutoff, chat_messages__isnull=False)
+        .distinct()
+    )
+
+
+def archive_event_chat(event_id, segment_size=SEGMENT_SIZE):
+    """Move all hot chat of the event into segments; returns messages moved."""
+    timestamp_field = serializers.DateTimeField()
+    moved = 0
+    while True:
+        rows = list(
+            ChatMessage.objects.filter(event_id=event_id).order_by('id')
+            .values_list('id', 'sender_id', 'message', 'timestamp')[:segment_size]
+        )
+        if not rows:
+            return moved
+        records = [[pk, sender_id, message, timestamp_field.to_representation(ts)] for pk, sender_id, message, ts in rows]
+        with transaction.atomic():
+            ChatArchiveSegment.objects.create(
+                event_id=event_id,
+                first_message_id=rows[0][0],
+                last_message_id=rows[-1][0],
+                message_count=len(rows),
+                data=zlib.compress(json.dumps(records, separators=(',', ':')).encode('utf-8'), 9),
+            )
+            ChatMessage.objects.filter(event_id=event_id, id__lte=rows[-1][0]).delete()
+        moved += len(rows)
+
+
+def _records(segment):
+    return json.loads(zlib.decompress(bytes(segment.data)))
+
+
+def holds(event_id, message_id):
+    """Whether `message_id` falls at or before the end of the event's archive."""
+    return ChatArchiveSegment.objects.filter(event_id=event_id, last_message_id__gte=message_id).exists()
+
+
+def holds_before(event_id, message_id):
+    """Whether any archived message of the event is older than `message_id`."""
+    return ChatArchiveSegment.objects.filter(event_id=event_id, first_message_id__lt=message_id).exists()
+
+
+def read_before(event_id, before_id, limit):
+    """
+    Up to `limit` archived messages older than `before_id` (all when None),
+    oldest first, and whether older ones remain.
+    """
+    segments = ChatArchiveSegment.objects.filter(event_id=event_id).order_by('-last_message_id')
+    if before_id is not None:
+        segments = segments.filter(first_message_id__lt=before_id)
+    collected = []
+    for segment in segments.iterator(chunk_size=4):
+        records = [r for r in _records(segment) if before_id is None or r[0] < before_id]
+        collected = records + collected
+        if len(collected) > limit:
+            break
+    return _serialize(event_id, collected[-limit:]), len(collected) > limit
+
+
+def read_after(event_id, after_id, limit):
+    """Up to `limit` archived messages newer than `after_id`, oldest first, and whether more remain."""
+    segments = (
+        ChatArchiveSegment.objects.filter(event_id=event_id, last_message_id__gt=after_id)
+        .order_by('last_message_id')
+    )
+    collected = []
+    for segment in segments.iterator(chunk_size=4):
+        collected.extend(r for r in _records(segment) if r[0] > after_id)
+        if len(collected) > limit:
+            break
+    return _serialize(event_id, collected[:limit]), len(collected) > limit
+
+
+def _serialize(event_id, records):
+    """
+    Render archived rows exactly like ChatMessageSerializer renders hot ones.
+    Messages of deleted users are dropped, as the hot table's cascade would.
+    """
+    from .serializers import UserSerializer
+    senders = User.objects.in_bulk({record[1] for record in records}) if records else {}
+    return [
+        {
+            'id': pk,
+            'event': event_id,
+            'sender': UserSerializer(senders[sender_id]).data,
+            'message': message,
+            'timestamp': timestamp,
+        }
+        for pk, sender_id, message, timestamp in records
+        if sender_id in senders
+    ]
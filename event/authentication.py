@@ -0,0 +1,156 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+# ----------------------------
+# Token authentication cache
+# ----------------------------
+# Token -> user lookups are kept in a bounded, per-process LRU so most API
+# calls authenticate without a query. Entries are dropped as soon as this
+# process sees the token deleted (logout) or the user saved or deleted
+# (e.g. deactivated). Those changes also leave revocation markers in the
+# shared cache, and every hit checks them with one get_many, so the other
+# worker processes stop accepting the entry at once too.
+# TOKEN_AUTH_CACHE['TTL'] bounds how long changes made with
+# queryset.update(), which fire no signals, can go unnoticed.
+
+
+def revoked_token_key(key):
+    return f'auth:revoked:{key}'
+
+
+def changed_user_key(user_id):
+    return f'auth:user-changed:{user_id}'
+
+
+class TokenUserCache:
+    def __init__(self, max_size=10000, ttl=60, shared=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        # Cache holding revocation markers written by other processes
+        self.shared = shared
+        self.entries = OrderedDict()
+        self.keys_by_user = {}
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        """A private copy of the cached (user, token), or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[2] <= time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            user, token, cached_at = entry[0], entry[1], entry[3]
+        if self.shared is not None and self._revoked(key, user.pk, cached_at):
+            with self.lock:
+                if self.entries.get(key) is entry:
+                    self._drop(key)
+                self.misses += 1
+            return None
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            self.hits += 1
+        # Requests may modify request.user; never hand out the shared instance
+        user = copy.copy(user)
+        token = copy.copy(token)
+        token.user = user
+        return user, token
+
+    def set(self, key, user, token):
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (user, token, time.monotonic() + self.ttl, time.time())
+            self.keys_by_user[user.pk] = key
+            while len(self.entries) > self.max_size:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _revoked(self, key, user_id, cached_at):
+        markers = self.shared.get_many([revoked_token_key(key), changed_user_key(user_id)])
+        return revoked_token_key(key) in markers or markers.get(changed_user_key(user_id), 0) >= cached_at
+
+    def revoke(self, key):
+        """Drop the token here and tell every other process sharing the markers."""
+        self.invalidate(key)
+        if self.shared is not None:
+            self.shared.set(revoked_token_key(key), True, timeout=self.ttl)
+
+    def revoke_user(self, user_id):
+        self.invalidate_user(user_id)
+        if self.shared is not None:
+            # Stamped after commit, so an entry cached from the old row is always older
+            transaction.on_commit(
+                lambda: self.shared.set(changed_user_key(user_id), time.time(), timeout=self.ttl)
+            )
+
+    def invalidate(self, key):
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            key = self.keys_by_user.get(user_id)
+            if key is not None:
+                self._drop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_user.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def _drop(self, key):
+        user = self.entries.pop(key)[0]
+        if self.keys_by_user.get(user.pk) == key:
+            del self.keys_by_user[user.pk]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        options = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+        _token_cache = TokenUserCache(
+            max_size=options.get('MAX_SIZE', 10000), ttl=options.get('TTL', 60), shared=cache,
+        )
+    return _token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that consults the per-process token cache first."""
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+        return user, token
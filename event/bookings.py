@@ -0,0 +1,325 @@
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from . import cache
+from .models import Booking, Event, Notification, WaitlistEntry
+
+# ----------------------------
+# Seat accounting
+# ----------------------------
+# Event.seats_taken holds the tickets of every pending or confirmed booking.
+# Seats are claimed with a single conditional UPDATE in the same transaction
+# as the booking row, so concurrent requests can never oversell: the
+# database applies the capacity check and the increment atomically.
+# Booking.save() claims and releases for every insert or status change and
+# a post_delete signal releases on delete; bulk_book, which bypasses save(),
+# claims for its rows explicitly.
+
+HOLDING_STATUSES = ('pending', 'confirmed')
+
+
+class EventFull(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Not enough seats left for this event.'
+    default_code = 'event_full'
+
+
+def reserve_seats(event_id, count):
+    """Claim `count` seats; returns False when the event lacks capacity."""
+    has_room = Q(max_participants__isnull=True) | Q(max_participants__gte=F('seats_taken') + count)
+    claimed = Event.objects.filter(pk=event_id).filter(has_room).update(
+        seats_taken=F('seats_taken') + count, updated_at=timezone.now(),
+    )
+    if claimed:
+        cache.bump_versions([event_id])
+    return claimed == 1
+
+
+def release_seats(event_id, count):
+    Event.objects.filter(pk=event_id, seats_taken__gte=count).update(
+        seats_taken=F('seats_taken') - count, updated_at=timezone.now(),
+    )
+    cache.bump_versions([event_id])
+
+
+def held_tickets(status, ticket_count):
+    return ticket_count if status in HOLDING_STATUSES else 0
+
+
+def sync_seats(booking):
+    """
+    Claim or release the seats this save adds to or removes from the
+    booking's hold, raising EventFull when a claim does not fit. Called by
+    Booking.save inside its transaction, so every insert or status change
+    is counted however it is made. Returns the ids of events that got seats back.
+    """
+    previous = None
+    if booking.pk is not None:
+        previous = (
+            Booking.objects.select_for_update().filter(pk=booking.pk)
+            .values_list('event_id', 'status', 'ticket_count').first()
+        )
+    deltas = {}
+    if previous:
+        deltas[previous[0]] = -held_tickets(previous[1], previous[2])
+    deltas[booking.event_id] = deltas.get(booking.event_id, 0) + held_tickets(booking.status, booking.ticket_count)
+    freed = []
+    # Releases first, so moving a booking never fails on its own seats
+    for event_id, delta in sorted(deltas.items(), key=lambda item: item[1]):
+        if delta < 0:
+            release_seats(event_id, -delta)
+            freed.append(event_id)
+        elif delta > 0 and not reserve_seats(event_id, delta):
+            raise EventFull()
+    return freed
+
+
+def create_booking(serializer, user):
+    """
+    Save a BookingSerializer for `user`; Booking.save holds the seats
+    atomically. A booking the user cancelled earlier is revived rather than
+    duplicated.
+    """
+    event = serializer.validated_data['event']
+    try:
+        with transaction.atomic():
+            serializer.instance = (
+                Booking.objects.select_for_update().filter(event=event, user=user, status='cancelled').first()
+            )
+            status_value = serializer.validated_data.get('status', 'confirmed')
+            booking = serializer.save(user=user, status=status_value)
+            # Booked directly, so they no longer need their place in the queue
+            WaitlistEntry.objects.filter(event=event, user=user).delete()
+            return booking
+    except IntegrityError:
+        raise serializers.ValidationError({'event_id': 'You have already booked this event.'})
+
+
+def cancel_booking(booking):
+    """
+    Cancel the booking, give its seats back and promote the waitlist into
+    them; a no-op when already cancelled.
+    """
+    with transaction.atomic():
+        current = Booking.objects.select_for_update().filter(pk=booking.pk).exclude(status='cancelled').first()
+        if current is not None:
+            current.status = 'cancelled'
+            current.save(update_fields=['status'])
+    booking.status = 'cancelled'
+    return current is not None
+
+
+# ----------------------------
+# Waitlist
+# ----------------------------
+# Entries are served strictly first come, first served from the
+# (event, created_at, id) index: reading or removing the head is an index
+# seek however long the queue is. Promotion stops at the first entry that
+# does not fit, so nobody is overtaken by a smaller party.
+
+PROMOTED_TEMPLATE = 'Good news! A spot opened up for "{title}" and your {tickets} ticket(s) are now confirmed.'
+
+
+def waitlist_queue(event_id):
+    return WaitlistEntry.objects.filter(event_id=event_id).order_by('created_at', 'id')
+
+
+def waitlist_position(entry):
+    """
+    1-based place in the queue. Counts the entries ahead over the index, so
+    it costs O(position); computed only when joining, never on plain reads.
+    """
+    ahead = WaitlistEntry.objects.filter(event_id=entry.event_id).filter(
+        Q(created_at__lt=entry.created_at) | Q(created_at=entry.created_at, id__lt=entry.id)
+    )
+    return ahead.count() + 1
+
+
+def join_waitlist(event, user, tickets):
+    if Booking.objects.filter(event=event, user=user, status__in=HOLDING_STATUSES).exists():
+        raise serializers.ValidationError({'message': 'You already have a booking for this event.'})
+    if event.max_participants is None or event.seats_taken + tickets <= event.max_participants:
+        raise serializers.ValidationError({'message': 'Seats are available; book the event directly.'})
+    entry, _ = WaitlistEntry.objects.get_or_create(event=event, user=user, defaults={'ticket_count': tickets})
+    return entry
+
+
+def promote_waitlist(event_id):
+    """Turn queue heads into confirmed bookings while seats allow. Returns the promoted entries."""
+    promoted = []
+    with transaction.atomic():
+        while True:
+            head = waitlist_queue(event_id).select_for_update().first()
+            if head is None:
+                break
+            if Booking.objects.filter(event_id=event_id, user_id=head.user_id, status__in=HOLDING_STATUSES).exists():
+                # Booked some other way since joining; drop the stale entry
+                head.delete()
+                continue
+            try:
+                # Booking.save claims the seats; a user may return after
+                # cancelling, so reuse their booking row
+                with transaction.atomic():
+                    Booking.objects.update_or_create(
+                        event_id=event_id, user_id=head.user_id,
+                        defaults={'status': 'confirmed', 'ticket_count': head.ticket_count},
+                    )
+            except EventFull:
+                break
+            head.delete()
+            promoted.append(head)
+        if promoted:
+            event = Event.objects.only('title').get(pk=event_id)
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=entry.user_id,
+                    message=PROMOTED_TEMPLATE.format(title=event.title, tickets=entry.ticket_count),
+                )
+                for entry in promoted
+            ])
+    return promoted
+
+
+# ----------------------------
+# Bulk booking
+# ----------------------------
+# One request books many (user, event) pairs: events, users and existing
+# bookings are loaded with one query each, seats are claimed with one
+# conditional UPDATE per event, and new rows go in with a single
+# bulk_create, all inside one transaction.
+
+MAX_BULK_BOOKINGS = 500
+
+
+def rolled_back_result(index):
+    return {'index': index, 'status': 'error', 'code': 'rolled_back', 'error': 'Not booked because another item failed.'}
+
+
+def _claim_event_seats(event_id, items):
+    """Reserve seats for the event's items, whole group first, then one by one in order."""
+    if reserve_seats(event_id, sum(item['ticket_count'] for item in items)):
+        return items
+    fitted = []
+    for item in items:
+        if reserve_seats(event_id, item['ticket_count']):
+            fitted.append(item)
+    return fitted
+
+
+def _insert_bookings(items, on_conflict):
+    """
+    Insert bookings for `items` with one bulk_create, falling back to one
+    row at a time when a concurrent booking takes a (user, event) slot.
+    Returns (item, booking id) pairs; `on_conflict` gets the rows that lost.
+    """
+    def build(item):
+        return Booking(event_id=item['event_id'], user_id=item['user_id'], ticket_count=item['ticket_count'])
+
+    try:
+        with transaction.atomic():
+            created = Booking.objects.bulk_create([build(item) for item in items])
+        return [(item, booking.pk) for item, booking in zip(items, created)]
+    except IntegrityError:
+        inserted = []
+        for item in items:
+            try:
+                with transaction.atomic():
+                    booking, = Booking.objects.bulk_create([build(item)])
+                inserted.append((item, booking.pk))
+            except IntegrityError:
+                on_conflict(item)
+        return inserted
+
+
+def bulk_book(requester, items, all_or_nothing=False):
+    """
+    Book validated `items` ({index, event_id, user_id, ticket_count}).
+    Users other than the requester may only be booked onto events the
+    requester organizes. Returns one result per item, in input order.
+    With `all_or_nothing`, any failure rolls every booking back.
+    """
+    results = {}
+
+    def fail(item, code, message):
+        results[item['index']] = {'index': item['index'], 'status': 'error', 'code': code, 'error': message}
+
+    events = Event.objects.only('id', 'created_by_id').in_bulk({item['event_id'] for item in items})
+    user_ids = {item['user_id'] for item in items}
+    users = set(User.objects.filter(id__in=user_ids, is_active=True).values_list('id', flat=True))
+    existing = {
+        (event_id, user_id): (pk, booking_status)
+        for pk, event_id, user_id, booking_status in Booking.objects.filter(
+            event_id__in=events.keys(), user_id__in=users,
+        ).values_list('id', 'event_id', 'user_id', 'status')
+    }
+
+    pending, seen = {}, set()
+    for item in items:
+        key = (item['event_id'], item['user_id'])
+        event = events.get(item['event_id'])
+        if event is None:
+            fail(item, 'event_not_found', 'Event not found.')
+        elif item['user_id'] not in users:
+            fail(item, 'user_not_found', 'User not found.')
+        elif item['user_id'] != requester.id and event.created_by_id != requester.id:
+            fail(item, 'forbidden', 'Only the organizer can book other users onto this event.')
+        elif key in seen or existing.get(key, (None, 'cancelled'))[1] in HOLDING_STATUSES:
+            fail(item, 'already_booked', 'This user already has a booking for this event.')
+        else:
+            seen.add(key)
+            pending.setdefault(item['event_id'], []).append(item)
+
+    booked = []
+    with transaction.atomic():
+        if not (all_or_nothing and results):
+            for event_id, event_items in pending.items():
+                fitted = _claim_event_seats(event_id, event_items)
+                for item in event_items:
+                    if item not in fitted:
+                        fail(item, 'event_full', EventFull.default_detail)
+                booked.extend(fitted)
+
+        if all_or_nothing and results:
+            booked = []
+
+        def conflict(item):
+            # Booked concurrently since `existing` was read
+            release_seats(item['event_id'], item['ticket_count'])
+            fail(item, 'already_booked', 'This user already has a booking for this event.')
+
+        fresh, written = [], []
+        for item in booked:
+            previous = existing.get((item['event_id'], item['user_id']))
+            if previous is None:
+                fresh.append(item)
+                continue
+            # A cancelled booking is revived rather than duplicated
+            revived = Booking.objects.filter(pk=previous[0], status='cancelled').update(
+                status='confirmed', ticket_count=item['ticket_count'],
+            )
+            if revived:
+                written.append((item, previous[0]))
+            else:
+                conflict(item)
+        written.extend(_insert_bookings(fresh, conflict))
+
+        if all_or_nothing and results:
+            # Give back every seat claimed and every row written above
+            transaction.set_rollback(True)
+            written = []
+        for item, booking_id in written:
+            results[item['index']] = {'index': item['index'], 'status': 'booked', 'booking_id': booking_id}
+        if written:
+            queued = Q()
+            for item, _ in written:
+                queued |= Q(event_id=item['event_id'], user_id=item['user_id'])
+            WaitlistEntry.objects.filter(queued).delete()
+
+    if all_or_nothing:
+        for item in items:
+            results.setdefault(item['index'], rolled_back_result(item['index']))
+    return [results[item['index']] for item in items]
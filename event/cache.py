@@ -0,0 +1,133 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+# ----------------------------
+# Versioned response cache
+# ----------------------------
+# Cached responses are keyed by version counters, never deleted: a write
+# bumps the counters it affects and every key built from the old values is
+# simply never read again. Counters start from a nanosecond timestamp so a
+# counter that was evicted can never come back with a value an old response
+# was stored under.
+
+FEED_VERSION_KEY = 'event:version:feed'
+RESPONSE_KEY_PREFIX = 'event:response'
+
+
+def event_version_key(event_id):
+    return f'event:version:{event_id}'
+
+
+def favorites_version_key(user_id):
+    return f'event:version:favorites:{user_id}'
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_versions(event_ids=()):
+    """
+    Invalidate the feed and the given events. Bumps once now and again after
+    commit, so a reader that fetched the old rows while the write was in
+    flight cannot leave them cached under the new version.
+    """
+    keys = [FEED_VERSION_KEY] + [event_version_key(event_id) for event_id in event_ids]
+    _bump(keys)
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def bump_favorites_version(user_id):
+    keys = [favorites_version_key(user_id)]
+    _bump(keys)
+    transaction.on_commit(lambda: _bump(keys))
+
+
+class VersionedCacheMixin:
+    """
+    Serve GET responses from the cache under the versions returned by
+    `get_cache_version_keys`. Only successful responses are stored.
+    Cached data is shared by all users; per-user additions belong in
+    `personalize_response`, which runs after the cache on hits and misses.
+    """
+    cache_timeout = 300
+
+    def get_cache_version_keys(self):
+        return [FEED_VERSION_KEY]
+
+    def personalize_response(self, request, response):
+        pass
+
+    def get_response_cache_key(self, request):
+        versions = get_versions(self.get_cache_version_keys())
+        digest = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+        return f'{RESPONSE_KEY_PREFIX}:{type(self).__name__}:{"-".join(map(str, versions))}:{digest}'
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            self.personalize_response(request, response)
+            return response
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout)
+            self.personalize_response(request, response)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+# ----------------------------
+# Conditional GET
+# ----------------------------
+class ConditionalGetMixin:
+    """
+    Answer If-None-Match / If-Modified-Since with 304 before the body is
+    built. Subclasses return cheap validators from `get_validators`: a string
+    that changes whenever the resource does, and its last-modified datetime.
+    Either may be None, e.g. when the object does not exist.
+    """
+
+    def get_validators(self, request):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        version, last_modified = self.get_validators(request)
+        etag = None
+        if version is not None:
+            source = f'{version}:{request.get_full_path()}:{request.accepted_media_type}'
+            etag = quote_etag(hashlib.md5(source.encode('utf-8')).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            if etag:
+                response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
@@ -0,0 +1,157 @@
+from collections import Counter
+
+from django.db.models import Case, CharField, Count, Q, Value, When
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from . import geo
+from .models import EventTag
+from .tags import parse_slugs
+
+
+def parse_floats(value, count, name):
+    try:
+        numbers = [float(part) for part in value.split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count:
+        raise ValidationError({name: f'Expected {count} comma-separated numbers'})
+    return numbers
+
+
+def parse_bbox(value, name='bbox'):
+    """`min_lon,min_lat,max_lon,max_lat` -> (min_lat, min_lon, max_lat, max_lon)"""
+    min_lon, min_lat, max_lon, max_lat = parse_floats(value, 4, name)
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+        raise ValidationError({name: 'Invalid bounding box'})
+    return min_lat, min_lon, max_lat, max_lon
+
+
+# ----------------------------
+# Event Filters
+# ----------------------------
+class EventProximityFilter(BaseFilterBackend):
+    """
+    ?near=lat,lon&radius=km keeps events within `radius` km of the point.
+    """
+    default_radius_km = 25
+    max_radius_km = 500
+
+    def filter_queryset(self, request, queryset, view):
+        near = request.query_params.get('near')
+        if not near:
+            return queryset
+        latitude, longitude = parse_floats(near, 2, 'near')
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValidationError({'near': 'Coordinates are out of range'})
+        try:
+            radius = float(request.query_params.get('radius', self.default_radius_km))
+        except ValueError:
+            raise ValidationError({'radius': 'Expected a number of kilometres'})
+        if not 0 < radius <= self.max_radius_km:
+            raise ValidationError({'radius': f'Must be between 0 and {self.max_radius_km} km'})
+        return geo.filter_near(queryset, latitude, longitude, radius)
+
+
+class EventFacetFilter(BaseFilterBackend):
+    """
+    Filter by the facet parameters below; several comma-separated values
+    within one facet are OR-ed, different facets are AND-ed:
+
+        ?category=Trekking,Cultural&gender_preference=any&is_free_event=true
+        &prior_experience_required=false&price=under_100,100_500
+
+    `facet_counts` returns the matching counts for every facet value from a
+    single GROUP BY over the facet columns. Each facet's counts honour every
+    selection except its own, so the UI can show what a click would yield.
+    """
+    PRICE_BUCKETS = (
+        ('free', Q(ticket_price__lte=0)),
+        ('under_100', Q(ticket_price__gt=0, ticket_price__lt=100)),
+        ('100_500', Q(ticket_price__gte=100, ticket_price__lt=500)),
+        ('500_1000', Q(ticket_price__gte=500, ticket_price__lt=1000)),
+        ('1000_plus', Q(ticket_price__gte=1000)),
+    )
+    BOOLEAN_FACETS = ('is_free_event', 'prior_experience_required')
+    FACETS = ('category', 'gender_preference', 'is_free_event', 'prior_experience_required', 'price')
+
+    def get_selections(self, request):
+        selections = {}
+        for facet in self.FACETS:
+            raw = request.query_params.get(facet)
+            if not raw:
+                continue
+            values = [value.strip() for value in raw.split(',') if value.strip()]
+            if facet in self.BOOLEAN_FACETS:
+                values = [self.parse_bool(facet, value) for value in values]
+            elif facet == 'price':
+                unknown = set(values) - {name for name, _ in self.PRICE_BUCKETS}
+                if unknown:
+                    raise ValidationError({'price': f'Unknown price bucket: {", ".join(sorted(unknown))}'})
+            selections[facet] = set(values)
+        return selections
+
+    def parse_bool(self, facet, value):
+        lowered = value.lower()
+        if lowered in ('true', '1', 'yes'):
+            return True
+        if lowered in ('false', '0', 'no'):
+            return False
+        raise ValidationError({facet: 'Expected true or false'})
+
+    def facet_q(self, facet, values):
+        if facet == 'price':
+            condition = Q()
+            for name, bucket in self.PRICE_BUCKETS:
+                if name in values:
+                    condition |= bucket
+            return condition
+        return Q(**{f'{facet}__in': values})
+
+    def filter_queryset(self, request, queryset, view):
+        for facet, values in self.get_selections(request).items():
+            queryset = queryset.filter(self.facet_q(facet, values))
+        return queryset
+
+    def facet_counts(self, request, queryset):
+        selections = self.get_selections(request)
+        price_bucket = Case(
+            *[When(bucket, then=Value(name)) for name, bucket in self.PRICE_BUCKETS],
+            output_field=CharField(),
+        )
+        rows = (
+            queryset.prefetch_related(None).order_by()
+            .annotate(price=price_bucket)
+            .values(*self.FACETS)
+            .annotate(total=Count('id'))
+        )
+        counts = {facet: Counter() for facet in self.FACETS}
+        for row in rows:
+            misses = [facet for facet, values in selections.items() if row[facet] not in values]
+            for facet in self.FACETS:
+                # A row counts toward a facet if it passes every other facet's selection
+                if not misses or misses == [facet]:
+                    counts[facet][row[facet]] += row['total']
+        return {
+            facet: [{'value': value, 'count': count} for value, count in counter.most_common()]
+            for facet, counter in counts.items()
+        }
+
+
+class EventTagFilter(BaseFilterBackend):
+    """
+    ?tags=adventure,trekking keeps events with any of the tags;
+    add &tag_mode=all to require every tag. Matching is case-insensitive.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        slugs = parse_slugs(request.query_params.get('tags'))
+        if not slugs:
+            return queryset
+        mode = request.query_params.get('tag_mode', 'any')
+        if mode not in ('any', 'all'):
+            raise ValidationError({'tag_mode': 'Expected any or all'})
+        links = EventTag.objects.filter(tag__slug__in=slugs)
+        if mode == 'all':
+            links = links.values('event_id').annotate(matched=Count('tag_id')).filter(matched=len(slugs))
+        return queryset.filter(id__in=links.values('event_id'))
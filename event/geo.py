@@ -0,0 +1,161 @@
+import math
+
+from django.db.models import Avg, Count, F, FloatField, Min, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt, Substr
+
+# ----------------------------
+# Geohash helpers
+# ----------------------------
+# Events carry a geohash of their coordinates in an indexed column. A cell
+# at precision p is the range of hashes sharing its first p characters, so
+# "events in these cells" becomes a handful of index range scans.
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+MAX_PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# Upper bound on cells used to cover a search area before giving up on the
+# geohash prefilter and relying on the lat/lon range filter alone
+MAX_COVER_CELLS = 16
+
+
+def encode(latitude, longitude, precision=MAX_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        span, value = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (span[0] + span[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            span[0] = middle
+        else:
+            span[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell."""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def cells_across(min_lat, min_lon, max_lat, max_lon, precision):
+    height, width = cell_size(precision)
+    rows = math.floor((max_lat + 90) / height) - math.floor((min_lat + 90) / height) + 1
+    columns = math.floor((max_lon + 180) / width) - math.floor((min_lon + 180) / width) + 1
+    return rows * columns
+
+
+def precision_for_bbox(min_lat, min_lon, max_lat, max_lon, max_cells):
+    """Finest precision at which the box spans at most `max_cells` cells."""
+    for precision in range(MAX_PRECISION, 0, -1):
+        if cells_across(min_lat, min_lon, max_lat, max_lon, precision) <= max_cells:
+            return precision
+    return None
+
+
+def covering_cells(min_lat, min_lon, max_lat, max_lon):
+    """Geohash prefixes whose cells together cover the bounding box."""
+    precision = precision_for_bbox(min_lat, min_lon, max_lat, max_lon, MAX_COVER_CELLS)
+    if precision is None:
+        return []
+    height, width = cell_size(precision)
+    lats = _steps(min_lat, max_lat, height)
+    lons = _steps(min_lon, max_lon, width)
+    return sorted({encode(lat, lon, precision) for lat in lats for lon in lons})
+
+
+def _steps(start, stop, step):
+    values = []
+    while start < stop:
+        values.append(start)
+        start += step
+    values.append(stop)
+    return values
+
+
+def cell_filter(cells):
+    """Q matching geohashes inside any of the cells, as index-friendly ranges."""
+    condition = Q()
+    for cell in cells:
+        condition |= Q(geohash__gte=cell, geohash__lt=cell + '~')
+    return condition
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    d_lat = radius_km / KM_PER_DEGREE
+    d_lon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return (
+        max(latitude - d_lat, -90.0), max(longitude - d_lon, -180.0),
+        min(latitude + d_lat, 90.0), min(longitude + d_lon, 180.0),
+    )
+
+
+def within_bbox(queryset, min_lat, min_lon, max_lat, max_lon):
+    queryset = queryset.filter(
+        latitude__gte=min_lat, latitude__lte=max_lat,
+        longitude__gte=min_lon, longitude__lte=max_lon,
+    )
+    cells = covering_cells(min_lat, min_lon, max_lat, max_lon)
+    if cells:
+        queryset = queryset.filter(cell_filter(cells))
+    return queryset
+
+
+def haversine_expression(latitude, longitude):
+    """haversine_km from the point to each row's coordinates, as a database expression."""
+    phi = math.radians(latitude)
+    d_phi = Radians(F('latitude')) - Value(phi)
+    d_lambda = Radians(F('longitude') - Value(longitude))
+    a = (
+        Power(Sin(d_phi / Value(2.0)), 2)
+        + Value(math.cos(phi)) * Cos(Radians(F('latitude'))) * Power(Sin(d_lambda / Value(2.0)), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Value(1.0), Sqrt(a)), output_field=FloatField())
+
+
+def filter_near(queryset, latitude, longitude, radius_km):
+    """Events within `radius_km` of the point: index prefilter, exact refine, all in one query."""
+    candidates = within_bbox(queryset, *radius_bbox(latitude, longitude, radius_km))
+    return candidates.alias(distance_km=haversine_expression(latitude, longitude)).filter(distance_km__lte=radius_km)
+
+
+def cluster(queryset, min_lat, min_lon, max_lat, max_lon, max_clusters=64):
+    """
+    Group events inside the box into geohash cells sized so the viewport holds
+    about `max_clusters` of them, in a single GROUP BY query.
+    """
+    precision = precision_for_bbox(min_lat, min_lon, max_lat, max_lon, max_clusters) or 1
+    rows = (
+        within_bbox(queryset, min_lat, min_lon, max_lat, max_lon)
+        .annotate(cell=Substr('geohash', 1, precision))
+        .values('cell')
+        .annotate(count=Count('id'), center_lat=Avg('latitude'), center_lon=Avg('longitude'), event_id=Min('id'))
+        .order_by('cell')
+    )
+    return [
+        {
+            'geohash': row['cell'],
+            'latitude': row['center_lat'],
+            'longitude': row['center_lon'],
+            'count': row['count'],
+            'event_id': row['event_id'] if row['count'] == 1 else None,
+        }
+        for row in rows
+    ]
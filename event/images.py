@@ -0,0 +1,154 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import cache
+from .models import Event, EventImage, Profile
+
+# ----------------------------
+# Image variants
+# ----------------------------
+# Uploaded images get resized WebP and JPEG copies stored next to the
+# original ("event_images/Everest.jpg" -> "event_images/Everest.jpg.card.webp";
+# the source extension is kept so Everest.jpg and Everest.png never collide).
+# Their names are recorded in the model's <field>_variants JSON field, which
+# serializers turn into URLs, so list screens can fetch a few kilobytes
+# instead of the original upload.
+
+# name -> longest side in pixels; smaller originals are never upscaled
+VARIANTS = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1600,
+}
+# model -> image field with variants
+IMAGE_FIELDS = {
+    Event: 'image',
+    EventImage: 'image',
+    Profile: 'avatar',
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variants_field(field_name):
+    return f'{field_name}_variants'
+
+
+def is_current(instance, field_name):
+    """Whether the stored variants were made from the field's current file."""
+    fieldfile = getattr(instance, field_name)
+    return (getattr(instance, variants_field(field_name)) or {}).get('source') == (fieldfile.name or None)
+
+
+def _variant_name(source, variant, extension):
+    return f'{source}.{variant}.{extension}'
+
+
+def _flatten(image):
+    """RGB for JPEG; transparency is composited onto white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def source_in_use(source):
+    """Whether any row still points at `source`; rows may share one uploaded file."""
+    return any(model.objects.filter(**{field_name: source}).exists() for model, field_name in IMAGE_FIELDS.items())
+
+
+def delete_variants(storage, variants):
+    """Remove variant files, unless their source is still used by another row."""
+    if not variants or source_in_use(variants.get('source')):
+        return
+    for name, formats in variants.items():
+        if name == 'source':
+            continue
+        for path in formats.values():
+            storage.delete(path)
+
+
+def generate_variants(fieldfile):
+    """
+    Write every variant of `fieldfile` and return the mapping to store in
+    the variants field; {} when there is no file or it is not a readable image.
+    """
+    if not fieldfile:
+        return {}
+    storage = fieldfile.storage
+    try:
+        with storage.open(fieldfile.name, 'rb') as handle:
+            image = Image.open(handle)
+            # Let the JPEG decoder downscale while reading; far cheaper on big photos
+            image.draft('RGB', (max(VARIANTS.values()),) * 2)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        return {}
+
+    rgb = _flatten(image)
+    result = {'source': fieldfile.name}
+    for variant, longest_side in VARIANTS.items():
+        resized = rgb.copy()
+        resized.thumbnail((longest_side, longest_side), Image.LANCZOS)
+        result[variant] = {}
+        for extension, (pil_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = _variant_name(fieldfile.name, variant, extension)
+            # Overwrite in place; storage.save would otherwise pick a new name
+            storage.delete(name)
+            result[variant][extension] = storage.save(name, ContentFile(buffer.getvalue()))
+    return result
+
+
+def refresh_variants(instance, force=False):
+    """
+    Regenerate the instance's variants when its file changed (or `force`),
+    removing the previous ones, and invalidate what embeds them. Saves with a
+    queryset update, so no signals fire. Returns whether anything was written.
+    """
+    field_name = IMAGE_FIELDS[type(instance)]
+    if not force and is_current(instance, field_name):
+        return False
+    fieldfile = getattr(instance, field_name)
+    previous = getattr(instance, variants_field(field_name)) or {}
+    variants = generate_variants(fieldfile)
+    if fieldfile and not variants:
+        # Unreadable upload: remember the source so it is not retried on every save
+        variants = {'source': fieldfile.name}
+    if previous.get('source') not in (None, fieldfile.name):
+        delete_variants(fieldfile.storage, previous)
+    setattr(instance, variants_field(field_name), variants)
+
+    changes = {variants_field(field_name): variants}
+    if any(field.name == 'updated_at' for field in instance._meta.concrete_fields):
+        changes['updated_at'] = timezone.now()
+    type(instance).objects.filter(pk=instance.pk).update(**changes)
+    if isinstance(instance, EventImage):
+        Event.objects.filter(pk=instance.event_id).update(updated_at=timezone.now())
+    if isinstance(instance, (Event, EventImage)):
+        cache.bump_versions([getattr(instance, 'event_id', instance.pk)])
+    return True
+
+
+def variant_urls(fieldfile, variants, request=None):
+    """{'thumb': {'webp': url, 'jpeg': url}, ...} for the current file, or None."""
+    if not fieldfile or not variants or variants.get('source') != fieldfile.name:
+        return None
+    urls = {}
+    for variant in VARIANTS:
+        if variant not in variants:
+            return None
+        urls[variant] = {}
+        for extension, name in variants[variant].items():
+            url = fieldfile.storage.url(name)
+            urls[variant][extension] = request.build_absolute_uri(url) if request is not None else url
+    return urls
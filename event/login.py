@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.db.models.functions import Lower
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# ----------------------------
+# Login
+# ----------------------------
+# Users are found by LOWER(email), served by the auth_user_email_lower_idx
+# expression index, with their token and profile joined in the same query.
+# Password hashing runs on a dedicated pool of LOGIN_HASH_WORKERS threads
+# (hashlib releases the GIL, so hashes run in parallel) and at most that many
+# run at once: a login that cannot get a slot within LOGIN_HASH_WAIT seconds
+# is answered 503 instead of queueing behind a burst.
+
+
+class LoginBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, try again shortly.'
+    default_code = 'login_busy'
+    wait = 1  # sent as Retry-After
+
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = settings.LOGIN_HASH_WORKERS
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='login-hash')
+            _slots = threading.BoundedSemaphore(workers)
+    return _pool, _slots
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def find_user_by_email(email):
+    """The oldest account with this email in any letter case, token and profile joined."""
+    return (
+        User.objects.annotate(email_lower=Lower('email'))
+        .filter(email_lower=normalize_email(email))
+        .select_related('auth_token', 'profile')
+        .order_by('id')
+        .first()
+    )
+
+
+def email_taken(email):
+    return User.objects.annotate(email_lower=Lower('email')).filter(email_lower=normalize_email(email)).exists()
+
+
+def _verify(password, encoded):
+    """(valid, new_encoded) where new_encoded is set when the hash should move to the current policy."""
+    if encoded is None:
+        # Unknown email: spend the same work as a real check so timing does not reveal accounts
+        make_password(password)
+        return False, None
+    if not check_password(password, encoded):
+        return False, None
+    preferred = get_hasher('default')
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return True, None
+    if hasher.algorithm != preferred.algorithm or preferred.must_update(encoded):
+        return True, make_password(password)
+    return True, None
+
+
+def verify_password(user, password):
+    """
+    Check `password` for `user` (None when no account matched) on the hash
+    pool. Hashes made under an outdated policy are replaced on success.
+    """
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=settings.LOGIN_HASH_WAIT):
+        raise LoginBusy()
+    try:
+        valid, rehashed = pool.submit(_verify, password, user.password if user else None).result()
+    finally:
+        slots.release()
+    if valid and rehashed:
+        user.password = rehashed
+        user.save(update_fields=['password'])
+    return valid and user.is_active
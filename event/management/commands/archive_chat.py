@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from event import archive
+
+
+class Command(BaseCommand):
+    help = 'Move chat of long-finished events into compressed archive segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Archive chat of events that ended this many days ago (default: CHAT_ARCHIVE_AFTER_DAYS)',
+        )
+        parser.add_argument(
+            '--segment-size', type=int, default=archive.SEGMENT_SIZE,
+            help='Messages per archive segment',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = archive.archive_cutoff(options['days'])
+        event_ids = list(archive.archivable_events(cutoff).values_list('id', flat=True))
+        moved = 0
+        for event_id in event_ids:
+            moved += archive.archive_event_chat(event_id, options['segment_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} messages from {len(event_ids)} events.'))
@@ -0,0 +1,59 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = 'Measure login throughput and latency against the configured database and hasher policy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Total login attempts (default: 50)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Parallel clients (default: 4)')
+        parser.add_argument('--wrong-password', action='store_true', help='Benchmark failed logins instead')
+
+    def handle(self, *args, **options):
+        suffix = uuid.uuid4().hex[:12]
+        email, password = f'benchmark-{suffix}@example.com', uuid.uuid4().hex
+        user = User.objects.create_user(f'benchmark-{suffix}', email, password)
+        payload = {'email': email, 'password': 'wrong' if options['wrong_password'] else password}
+        url = reverse('login')
+
+        def attempt(_):
+            started = time.perf_counter()
+            try:
+                response = Client(HTTP_HOST='localhost').post(url, payload, content_type='application/json')
+                return response.status_code, time.perf_counter() - started
+            finally:
+                connection.close()
+
+        # Throttling would turn most attempts into 429s and measure nothing
+        try:
+            with override_settings(AUTH_THROTTLE_RATES={}):
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as clients:
+                    results = list(clients.map(attempt, range(options['requests'])))
+                elapsed = time.perf_counter() - started
+        finally:
+            user.delete()
+
+        latencies = sorted(latency for _, latency in results)
+        codes = {}
+        for code, _ in results:
+            codes[code] = codes.get(code, 0) + 1
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(f'{len(results)} logins in {elapsed:.2f}s: {len(results) / elapsed:.1f}/s')
+        self.stdout.write(
+            f'latency p50 {statistics.median(latencies) * 1000:.0f}ms, p95 {p95 * 1000:.0f}ms, '
+            f'max {latencies[-1] * 1000:.0f}ms'
+        )
+        expected = 401 if options['wrong_password'] else 200
+        if set(codes) != {expected}:
+            raise CommandError(f'Expected only {expected} responses, got status codes: {dict(sorted(codes.items()))}')
+        self.stdout.write(self.style.SUCCESS(f'status codes: {dict(sorted(codes.items()))}'))
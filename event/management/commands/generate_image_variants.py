@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from event import images
+
+
+class Command(BaseCommand):
+    help = 'Create thumb/card/full WebP and JPEG variants for existing event images and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Regenerate variants that are already up to date',
+        )
+
+    def handle(self, *args, **options):
+        for model, field_name in images.IMAGE_FIELDS.items():
+            with_file = model.objects.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+            written = 0
+            for instance in with_file.iterator(chunk_size=100):
+                written += images.refresh_variants(instance, force=options['force'])
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {written} of {with_file.count()} updated')
+        self.stdout.write(self.style.SUCCESS('Image variants are up to date.'))
@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from event import user_import
+
+
+class Command(BaseCommand):
+    help = 'Import users from a CSV or NDJSON file, creating their tokens and profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or NDJSON file, or '-' for stdin")
+        parser.add_argument(
+            '--format', choices=['csv', 'ndjson'], default=None,
+            help='Input format (default: from the file extension, csv for stdin)',
+        )
+        parser.add_argument('--batch-size', type=int, default=user_import.BATCH_SIZE)
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Password hashing processes (default: one per CPU)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(exc)
+        try:
+            report = user_import.import_users(
+                stream, fmt, options['batch_size'], options['workers'],
+                on_skip=lambda line, reason: self.stderr.write(f'line {line}: {reason}'),
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(f'Imported {report.created} users, skipped {report.skipped}.'))
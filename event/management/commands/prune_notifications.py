@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from event import notifications
+
+
+class Command(BaseCommand):
+    help = 'Delete notifications past the retention age or beyond the per-user limit'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-days', type=int, default=None,
+            help='Delete notifications older than this (default: NOTIFICATION_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--max-per-user', type=int, default=None,
+            help='Keep at most this many per user (default: NOTIFICATION_MAX_PER_USER)',
+        )
+        parser.add_argument('--batch-size', type=int, default=notifications.PRUNE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        expired = notifications.prune_expired(options['max_age_days'], options['batch_size'])
+        overflow = notifications.prune_overflow(options['max_per_user'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {expired} expired and {overflow} over-limit notifications.'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from event import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the event full-text search index from the event table'
+
+    def handle(self, *args, **options):
+        if not search.search_enabled():
+            self.stdout.write(self.style.WARNING('Full-text index is only maintained on SQLite; nothing to do.'))
+            return
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} events.'))
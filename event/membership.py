@@ -0,0 +1,28 @@
+from django.db.models import CharField, Value
+
+from .bookings import HOLDING_STATUSES
+from .models import Booking, Favorite
+
+# ----------------------------
+# Per-user event flags
+# ----------------------------
+# Feed pages are cached for everyone, so the viewer's own relation to each
+# event is looked up afterwards: one UNION query over the page's ids.
+
+
+def event_flags(user, event_ids):
+    """{event_id: {'is_favorited': bool, 'is_booked': bool}} for the given events."""
+    flags = {event_id: {'is_favorited': False, 'is_booked': False} for event_id in event_ids}
+    if not flags or not user.is_authenticated:
+        return flags
+    favorited = (
+        Favorite.objects.filter(user=user, event_id__in=flags)
+        .annotate(flag=Value('is_favorited', output_field=CharField())).values_list('event_id', 'flag')
+    )
+    booked = (
+        Booking.objects.filter(user=user, event_id__in=flags, status__in=HOLDING_STATUSES)
+        .annotate(flag=Value('is_booked', output_field=CharField())).values_list('event_id', 'flag')
+    )
+    for event_id, flag in favorited.union(booked, all=True):
+        flags[event_id][flag] = True
+    return flags
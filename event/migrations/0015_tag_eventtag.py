@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0014_event_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.CharField(max_length=100, unique=True)),
+                ('event_count', models.PositiveIntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EventTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='event.event')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_links', to='event.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', 'event'], name='eventtag_tag_event_idx')],
+                'unique_together': {('event', 'tag')},
+            },
+        ),
+    ]
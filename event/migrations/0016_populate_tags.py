@@ -0,0 +1,41 @@
+from collections import Counter
+
+from django.db import migrations
+
+
+def populate_tags(apps, schema_editor):
+    Event = apps.get_model('event', 'Event')
+    Tag = apps.get_model('event', 'Tag')
+    EventTag = apps.get_model('event', 'EventTag')
+
+    names, links = {}, []
+    for event_id, value in Event.objects.exclude(tags__isnull=True).exclude(tags='').values_list('id', 'tags').iterator():
+        slugs = set()
+        for name in value.split(','):
+            name = ' '.join(name.split())[:100]
+            if name and name.lower() not in slugs:
+                slugs.add(name.lower())
+                names.setdefault(name.lower(), name)
+                links.append((event_id, name.lower()))
+
+    Tag.objects.bulk_create([Tag(slug=slug, name=name) for slug, name in names.items()], ignore_conflicts=True)
+    tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+    EventTag.objects.bulk_create(
+        [EventTag(event_id=event_id, tag_id=tag_ids[slug]) for event_id, slug in links],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    counts = Counter(slug for _, slug in links)
+    for slug, count in counts.items():
+        Tag.objects.filter(slug=slug).update(event_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0015_tag_eventtag'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_tags, migrations.RunPython.noop),
+    ]
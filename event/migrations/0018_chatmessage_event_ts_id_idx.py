@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0017_notification_profile_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['event', 'timestamp', 'id'], name='chat_event_ts_id_idx'),
+        ),
+    ]
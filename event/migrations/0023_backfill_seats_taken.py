@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_seats_taken(apps, schema_editor):
+    Event = apps.get_model('event', 'Event')
+    Booking = apps.get_model('event', 'Booking')
+    held = (
+        Booking.objects.filter(event=OuterRef('pk')).exclude(status='cancelled')
+        .values('event').annotate(total=Sum('ticket_count')).values('total')
+    )
+    Event.objects.update(seats_taken=Coalesce(Subquery(held), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0022_event_seats_taken'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_seats_taken, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Event = apps.get_model('event', 'Event')
+    Review = apps.get_model('event', 'Review')
+    buckets = {
+        'rating_1_count': Count('id', filter=Q(rating__lte=1)),
+        'rating_2_count': Count('id', filter=Q(rating=2)),
+        'rating_3_count': Count('id', filter=Q(rating=3)),
+        'rating_4_count': Count('id', filter=Q(rating=4)),
+        'rating_5_count': Count('id', filter=Q(rating__gte=5)),
+    }
+    rows = Review.objects.values('event_id').annotate(rating_count=Count('id'), **buckets)
+    for row in rows.iterator():
+        event_id = row.pop('event_id')
+        stars_total = sum(stars * row[f'rating_{stars}_count'] for stars in range(1, 6))
+        Event.objects.filter(pk=event_id).update(rating_avg=stars_total / row['rating_count'], **row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0025_event_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = 'auth_user_email_lower_idx'
+
+
+def create_email_index(apps, schema_editor):
+    # auth.User belongs to another app, so its lookup index is created here
+    table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    quote = schema_editor.quote_name
+    expression = 'LOWER(email)' if schema_editor.connection.vendor != 'mysql' else '(LOWER(email))'
+    schema_editor.execute(f'CREATE INDEX {quote(INDEX_NAME)} ON {quote(table)} ({expression})')
+
+
+def drop_email_index(apps, schema_editor):
+    table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    quote = schema_editor.quote_name
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(f'DROP INDEX {quote(INDEX_NAME)} ON {quote(table)}')
+    else:
+        schema_editor.execute(f'DROP INDEX {quote(INDEX_NAME)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('event', '0026_backfill_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_index, drop_email_index),
+    ]
@@ -1,9 +1,24 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
+from . import geo
+
 # ----------------------------
 # Event Model
 # ----------------------------
+class EventQuerySet(models.QuerySet):
+    def with_related(self, fields=None):
+        """
+        Load the relations EventSerializer nests in a fixed number of queries.
+        `fields` limits loading to the relations a trimmed response will render.
+        """
+        queryset = self
+        if fields is None or 'created_by' in fields:
+            queryset = queryset.select_related('created_by')
+        prefetch = [name for name in ('participants', 'images') if fields is None or name in fields]
+        return queryset.prefetch_related(*prefetch)
+
+
 class Event(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -11,6 +26,7 @@ class Event(models.Model):
     location = models.CharField(max_length=255)
     category = models.CharField(max_length=100, blank=True, null=True)
     image = models.ImageField(upload_to='event_images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     # Advanced fields for professional look
     tags = models.CharField(max_length=255, blank=True, null=True)
@@ -18,8 +34,21 @@ class Event(models.Model):
     end_date_time = models.DateTimeField(blank=True, null=True)
     location_name = models.CharField(max_length=255, blank=True, null=True)
     map_link = models.URLField(max_length=500, blank=True, null=True)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
     min_participants = models.IntegerField(default=1)
     max_participants = models.IntegerField(blank=True, null=True)
+    # Tickets held by pending/confirmed bookings, maintained by event.bookings
+    seats_taken = models.PositiveIntegerField(default=0, editable=False)
+    # Review aggregates, maintained by event.ratings
+    rating_avg = models.FloatField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
     gender_preference = models.CharField(
         max_length=20, 
         choices=[('any', 'Any'), ('male', 'Male Only'), ('female', 'Female Only')], 
@@ -41,12 +70,75 @@ class Event(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = EventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='event_date_id_idx'),
+            models.Index(fields=['-rating_avg', '-id'], name='event_rating_id_idx'),
+        ]
+
+    # Counters that only move through atomic UPDATEs (event.bookings, event.ratings)
+    COUNTER_FIELDS = (
+        'seats_taken', 'rating_avg', 'rating_count',
+        'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    )
+
     def __str__(self):
         return self.title
 
+    @property
+    def rating_histogram(self):
+        return {str(stars): getattr(self, f'rating_{stars}_count') for stars in range(1, 6)}
+
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            # Writing back stale in-memory counters would undo concurrent
+            # bookings and reviews
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        elif update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+# ----------------------------
+# Tag Models
+# ----------------------------
+class Tag(models.Model):
+    """Normalized form of the comma-separated Event.tags, maintained on save."""
+    name = models.CharField(max_length=100)
+    slug = models.CharField(max_length=100, unique=True)
+    event_count = models.PositiveIntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return self.name
+
+
+class EventTag(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='event_links')
+
+    class Meta:
+        unique_together = ('event', 'tag')
+        indexes = [
+            models.Index(fields=['tag', 'event'], name='eventtag_tag_event_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag.name} on {self.event.title}"
+
+
 class EventImage(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='event_gallery/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -60,8 +152,17 @@ class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Covers the unread badge count without touching read rows
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_user_created_idx'),
+            models.Index(fields=['created_at'], name='notification_created_idx'),
+        ]
+
     def __str__(self):
         return f"Notification for {self.user.username} - {self.message[:20]}"
 
@@ -75,10 +176,37 @@ class ChatMessage(models.Model):
     message = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', 'timestamp', 'id'], name='chat_event_ts_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.sender.username}: {self.message[:20]}"
 
 
+class ChatArchiveSegment(models.Model):
+    """
+    An append-only block of archived chat for one event: zlib-compressed JSON
+    of [id, sender_id, message, timestamp] rows in id order. Segments of an
+    event never overlap and every archived message precedes the hot ones.
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='chat_archive_segments')
+    first_message_id = models.BigIntegerField()
+    last_message_id = models.BigIntegerField()
+    message_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', 'last_message_id'], name='chatarchive_event_last_idx'),
+        ]
+
+    def __str__(self):
+        return f"Chat archive {self.first_message_id}-{self.last_message_id} for {self.event.title}"
+
+
 # ----------------------------
 # Favorite Model
 # ----------------------------
@@ -102,6 +230,7 @@ class Profile(models.Model):
     bio = models.TextField(blank=True)
     hobbies = models.TextField(blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     phone = models.CharField(max_length=20, blank=True)
     location = models.CharField(max_length=255, blank=True)
     
@@ -111,7 +240,8 @@ class Profile(models.Model):
     document_image = models.ImageField(upload_to='kyc_docs/', blank=True, null=True)
     is_kyc_verified = models.BooleanField(default=False)
     kyc_submitted_at = models.DateTimeField(blank=True, null=True)
-    
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return f"Profile of {self.user.username}"
 
@@ -137,6 +267,36 @@ class Booking(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.event.title}"
 
+    def save(self, *args, **kwargs):
+        from . import bookings
+        # Seats move in the same transaction as the row (see event.bookings);
+        # deletes give them back in a post_delete signal
+        with transaction.atomic():
+            freed = bookings.sync_seats(self)
+            super().save(*args, **kwargs)
+            for event_id in freed:
+                bookings.promote_waitlist(event_id)
+
+
+# ----------------------------
+# Waitlist Model
+# ----------------------------
+class WaitlistEntry(models.Model):
+    """A place in the FIFO queue for a full event, promoted to a Booking when seats free up."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='waitlist')
+    ticket_count = models.IntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'event')
+        indexes = [
+            models.Index(fields=['event', 'created_at', 'id'], name='waitlist_event_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} waiting for {self.event.title}"
+
 
 # ----------------------------
 # Review Model
@@ -148,5 +308,10 @@ class Review(models.Model):
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', '-created_at', '-id'], name='review_event_created_idx'),
+        ]
+
     def __str__(self):
         return f"Review by {self.user.username} for {self.event.title}"
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Booking, Event, Notification
+
+# ----------------------------
+# Notification fan-out
+# ----------------------------
+
+FANOUT_BATCH_SIZE = 1000
+
+# Changes to these fields are announced to everyone attending the event
+ANNOUNCED_FIELDS = ('date', 'start_date_time', 'end_date_time', 'location', 'location_name')
+
+EVENT_CHANGED_TEMPLATE = '"{title}" has been updated: {changes}. Please check the new details.'
+
+
+def event_audience(event_id):
+    """Ids of the event's participants and active bookers, without duplicates."""
+    participants = Event.participants.through.objects.filter(event_id=event_id).values_list('user_id', flat=True)
+    bookers = (
+        Booking.objects.filter(event_id=event_id).exclude(status='cancelled')
+        .values_list('user_id', flat=True)
+    )
+    return participants.union(bookers)
+
+
+def notify_event_audience(event, template, batch_size=FANOUT_BATCH_SIZE, **context):
+    """
+    Send one notification per participant/booker of `event`. The template is
+    formatted once with the event's title, date and location plus `context`,
+    and rows are written with bulk_create in batches of `batch_size`.
+    Returns the number of notifications created.
+    """
+    message = template.format(
+        title=event.title, date=event.date, location=event.location_name or event.location, **context
+    )
+    created = 0
+    batch = []
+    with transaction.atomic():
+        for user_id in event_audience(event.pk).iterator(chunk_size=batch_size):
+            batch.append(Notification(user_id=user_id, message=message))
+            if len(batch) >= batch_size:
+                created += _write(batch)
+                batch = []
+        if batch:
+            created += _write(batch)
+    return created
+
+
+def _write(batch):
+    Notification.objects.bulk_create(batch, batch_size=len(batch))
+    return len(batch)
+
+
+# ----------------------------
+# Retention
+# ----------------------------
+# Notifications older than NOTIFICATION_RETENTION_DAYS, and anything past a
+# user's newest NOTIFICATION_MAX_PER_USER, are pruned by
+# `manage.py prune_notifications`. Deletes run in short batches so the
+# table is never locked for long.
+
+PRUNE_BATCH_SIZE = 1000
+
+
+def _delete_in_batches(queryset, batch_size):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Notification.objects.filter(id__in=ids).delete()[0]
+
+
+def prune_expired(max_age_days=None, batch_size=PRUNE_BATCH_SIZE):
+    if max_age_days is None:
+        max_age_days = settings.NOTIFICATION_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=max_age_days)
+    return _delete_in_batches(Notification.objects.filter(created_at__lt=cutoff), batch_size)
+
+
+def prune_overflow(max_per_user=None, batch_size=PRUNE_BATCH_SIZE):
+    """Keep only each user's newest `max_per_user` notifications."""
+    if max_per_user is None:
+        max_per_user = settings.NOTIFICATION_MAX_PER_USER
+    if max_per_user < 1:
+        raise ValueError('max_per_user must be at least 1')
+    crowded = (
+        Notification.objects.values('user_id').annotate(total=Count('id'))
+        .filter(total__gt=max_per_user).values_list('user_id', flat=True)
+    )
+    deleted = 0
+    for user_id in list(crowded):
+        feed = Notification.objects.filter(user_id=user_id)
+        # The oldest notification still kept, found by a seek on the feed index
+        boundary = feed.order_by('-created_at', '-id').values('created_at', 'id')[max_per_user - 1]
+        older = feed.filter(
+            Q(created_at__lt=boundary['created_at']) |
+            Q(created_at=boundary['created_at'], id__lt=boundary['id'])
+        )
+        deleted += _delete_in_batches(older, batch_size)
+    return deleted
@@ -0,0 +1,243 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q, Subquery
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# ----------------------------
+# Keyset Pagination
+# ----------------------------
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite key such as (date, id).
+
+    Each page is fetched with a seek condition on the last key seen rather
+    than an OFFSET, so page 1000 costs the same as page 1. The cursor is an
+    opaque base64 token; clients only ever follow the `next`/`previous` links.
+    All fields in `ordering` must sort in the same direction and the last one
+    must be unique.
+    """
+    ordering = ('-date', '-id')
+    page_size = 20
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if requested <= 0:
+            return self.page_size
+        return min(requested, self.max_page_size)
+
+    @property
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    @property
+    def descending(self):
+        return self.ordering[0].startswith('-')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            values, reverse, ordering = payload['k'], bool(payload.get('r')), payload.get('o')
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        # A cursor only makes sense under the ordering it was issued for
+        if ordering != ','.join(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def clean_cursor_values(self, queryset, values):
+        """Convert decoded key values through their model fields; a tampered cursor is a 404."""
+        opts = queryset.model._meta
+        try:
+            cleaned = [opts.get_field(field).to_python(value) for field, value in zip(self.fields, values)]
+        except (DjangoValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if any(value is None for value in cleaned):
+            raise NotFound(self.invalid_cursor_message)
+        return cleaned
+
+    def encode_cursor(self, instance, reverse):
+        values = []
+        for field in self.fields:
+            value = getattr(instance, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'k': values, 'r': int(reverse), 'o': ','.join(self.ordering)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def seek_filter(self, queryset, values, forward):
+        """Rows strictly after (forward) or before the key `values`."""
+        lookup = 'lt' if self.descending == forward else 'gt'
+        condition = Q()
+        for depth in range(len(self.fields)):
+            clause = {self.fields[i]: values[i] for i in range(depth)}
+            clause[f'{self.fields[depth]}__{lookup}'] = values[depth]
+            condition |= Q(**clause)
+        return queryset.filter(condition)
+
+    def get_ordering(self, request):
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = self.get_ordering(request)
+        page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        values, self.reverse = self.decode_cursor(request)
+        self.has_cursor = values is not None
+
+        if self.reverse:
+            order = [f[1:] if f.startswith('-') else f'-{f}' for f in self.ordering]
+        else:
+            order = list(self.ordering)
+        if values is not None:
+            values = self.clean_cursor_values(queryset, values)
+            queryset = self.seek_filter(queryset, values, forward=not self.reverse)
+        rows = list(queryset.order_by(*order)[:page_size + 1])
+
+        self.has_more = len(rows) > page_size
+        self.page = rows[:page_size]
+        if self.reverse:
+            self.page.reverse()
+        return self.page
+
+    def get_next_link(self):
+        more_forward = self.reverse or self.has_more
+        if not self.page or not more_forward:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        more_backward = self.has_more if self.reverse else self.has_cursor
+        if not self.page or not more_backward:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class EventCursorPagination(KeysetPagination):
+    """``?ordering=-rating`` pages by the (rating_avg, id) index instead of by date."""
+    ordering = ('-date', '-id')
+    ordering_query_param = 'ordering'
+    orderings = {
+        '-date': ('-date', '-id'),
+        '-rating': ('-rating_avg', '-id'),
+    }
+
+    def get_ordering(self, request):
+        requested = request.query_params.get(self.ordering_query_param)
+        if requested is None:
+            return self.ordering
+        if requested not in self.orderings:
+            raise ValidationError({self.ordering_query_param: f'Expected one of: {", ".join(self.orderings)}'})
+        return self.orderings[requested]
+
+
+class ReviewCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class NotificationCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+# ----------------------------
+# Chat History Pagination
+# ----------------------------
+class ChatHistoryPagination(BasePagination):
+    """
+    Windowed chat history, always returned oldest first:
+
+    - no cursor: the latest `limit` messages
+    - ``?before=<id>``: the `limit` messages preceding message <id>
+    - ``?after=<id>``: up to `limit` messages following message <id> (delta sync)
+
+    Messages are ordered by (timestamp, id) and every window is one seek on
+    the (event, timestamp, id) index, however long the thread is.
+    `has_more` says whether another window exists in the requested direction.
+    """
+    default_limit = 50
+    max_limit = 200
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def get_anchor(self, request, name):
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: 'Expected a message id'})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = limit = self.get_limit(request)
+        self.before = before = self.get_anchor(request, 'before')
+        self.after = after = self.get_anchor(request, 'after')
+        if before is not None and after is not None:
+            raise ValidationError('Use either before or after, not both')
+
+        if after is not None:
+            anchor = Subquery(queryset.model.objects.filter(pk=after).values('timestamp'))
+            queryset = queryset.filter(Q(timestamp__gt=anchor) | Q(timestamp=anchor, id__gt=after))
+            rows = list(queryset.order_by('timestamp', 'id')[:limit + 1])
+            self.has_more = len(rows) > limit
+            return rows[:limit]
+
+        if before is not None:
+            anchor = Subquery(queryset.model.objects.filter(pk=before).values('timestamp'))
+            queryset = queryset.filter(Q(timestamp__lt=anchor) | Q(timestamp=anchor, id__lt=before))
+        rows = list(queryset.order_by('-timestamp', '-id')[:limit + 1])
+        self.has_more = len(rows) > limit
+        return rows[:limit][::-1]
+
+    def get_paginated_response(self, data):
+        return Response({'has_more': self.has_more, 'results': list(data)})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'has_more': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,46 @@
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast, Greatest
+from django.utils import timezone
+
+from . import cache
+from .models import Event
+
+# ----------------------------
+# Review aggregates
+# ----------------------------
+# Event keeps rating_count, a 1-5 histogram and rating_avg so cards and the
+# ?ordering=-rating feed never touch the review table. Each review change
+# moves the counters with one UPDATE, then rating_avg is recomputed from the
+# histogram with a second one; both run in the database, so concurrent
+# reviews cannot lose an increment.
+
+STARS = range(1, 6)
+
+
+def histogram_field(rating):
+    """Bucket of a rating; out-of-range legacy values count as the nearest star."""
+    return f'rating_{min(max(rating, STARS[0]), STARS[-1])}_count'
+
+
+def adjust(event_id, removed=None, added=None):
+    """Move the event's aggregates for a rating that was `removed` and/or `added`."""
+    changes = {}
+    for rating, delta in ((removed, -1), (added, 1)):
+        if rating is None:
+            continue
+        for field in (histogram_field(rating), 'rating_count'):
+            changes[field] = changes.get(field, 0) + delta
+    changes = {field: delta for field, delta in changes.items() if delta}
+    if not changes:
+        return
+    events = Event.objects.filter(pk=event_id)
+    events.update(
+        updated_at=timezone.now(),
+        **{field: Greatest(F(field) + delta, 0) for field, delta in changes.items()},
+    )
+    stars_total = sum(F(f'rating_{stars}_count') * stars for stars in STARS)
+    events.update(rating_avg=Case(
+        When(rating_count=0, then=Value(0.0)),
+        default=Cast(stars_total, FloatField()) / Cast(F('rating_count'), FloatField()),
+    ))
+    cache.bump_versions([event_id])
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import re
+import threading
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedTokenAuthentication
+
+# ----------------------------
+# Pub/sub layer
+# ----------------------------
+# Chat rooms fan out through a pub/sub backend named by the
+# CHAT_PUBSUB_BACKEND setting. The in-process default is enough for a
+# single ASGI worker; a broker-backed class with the same three methods
+# (subscribe, unsubscribe, publish) lets several workers share rooms.
+
+
+class Subscription:
+    """An async iterator over the payloads published to one room."""
+
+    def __init__(self, room, loop, max_pending):
+        self.room = room
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+
+    def deliver(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # A client this far behind re-syncs over the REST history endpoint
+            pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+
+class InMemoryPubSub:
+    max_pending = 100
+
+    def __init__(self):
+        self.rooms = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, room):
+        subscription = Subscription(room, asyncio.get_running_loop(), self.max_pending)
+        with self.lock:
+            self.rooms.setdefault(room, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            members = self.rooms.get(subscription.room, set())
+            members.discard(subscription)
+            if not members:
+                self.rooms.pop(subscription.room, None)
+
+    def publish(self, room, payload):
+        """Safe to call from any thread, including sync views and signals."""
+        with self.lock:
+            members = list(self.rooms.get(room, ()))
+        for subscription in members:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, payload)
+
+
+_pubsub = None
+
+
+def get_pubsub():
+    global _pubsub
+    if _pubsub is None:
+        backend = getattr(settings, 'CHAT_PUBSUB_BACKEND', 'event.realtime.InMemoryPubSub')
+        _pubsub = import_string(backend)()
+    return _pubsub
+
+
+def chat_room(event_id):
+    return f'event-chat-{event_id}'
+
+
+def publish_chat_message(message):
+    from .serializers import ChatMessageSerializer
+    payload = json.dumps({'type': 'message', 'message': ChatMessageSerializer(message).data})
+    get_pubsub().publish(chat_room(message.event_id), payload)
+
+
+# ----------------------------
+# WebSocket chat
+# ----------------------------
+# ws://host/ws/events/<event_id>/chat/?token=<key>
+# The token is the same key /api/auth/login/ returns; an
+# "Authorization: Token <key>" header is accepted too. Clients send
+# {"message": "..."} and receive {"type": "message", "message": {...}}
+# for every message posted to the event, however it was created.
+
+CHAT_PATH = re.compile(r'^/ws/events/(?P<event_id>\d+)/chat/?$')
+
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NOT_FOUND = 4404
+
+
+def get_token_key(scope):
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    if query.get('token'):
+        return query['token'][0]
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            parts = value.decode('latin-1').split()
+            if len(parts) == 2 and parts[0].lower() == 'token':
+                return parts[1]
+    return None
+
+
+@sync_to_async
+def authenticate(key):
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+@sync_to_async
+def event_exists(event_id):
+    from .models import Event
+    return Event.objects.filter(pk=event_id).exists()
+
+
+@sync_to_async
+def save_message(event_id, user, text):
+    from .models import ChatMessage
+    # Broadcast happens in the ChatMessage post_save signal
+    return ChatMessage.objects.create(event_id=event_id, sender=user, message=text)
+
+
+async def send_json(send, data):
+    await send({'type': 'websocket.send', 'text': json.dumps(data)})
+
+
+async def chat_application(scope, receive, send):
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    match = CHAT_PATH.match(scope['path'])
+    if not match:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    key = get_token_key(scope)
+    user = await authenticate(key) if key else None
+    if user is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        return
+    event_id = int(match['event_id'])
+    if not await event_exists(event_id):
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+
+    pubsub = get_pubsub()
+    subscription = pubsub.subscribe(chat_room(event_id))
+    await send({'type': 'websocket.accept'})
+
+    async def forward():
+        async for payload in subscription:
+            await send({'type': 'websocket.send', 'text': payload})
+
+    forwarder = asyncio.ensure_future(forward())
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message['type'] != 'websocket.receive':
+                continue
+            try:
+                text = json.loads(message.get('text') or '')['message'].strip()
+            except (ValueError, KeyError, TypeError, AttributeError):
+                text = ''
+            if not text:
+                await send_json(send, {'type': 'error', 'message': 'Expected {"message": "<text>"}'})
+                continue
+            await save_message(event_id, user, text)
+    finally:
+        pubsub.unsubscribe(subscription)
+        forwarder.cancel()
@@ -0,0 +1,101 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Event
+
+# ----------------------------
+# Full-text search (SQLite FTS5)
+# ----------------------------
+# The `event_search` virtual table mirrors the searchable columns of Event,
+# keyed by rowid = event id. It is kept in sync by the Event save/delete
+# signals; writes that bypass signals (queryset.update, bulk_create) are
+# picked up by `manage.py rebuild_search_index`.
+
+SEARCH_TABLE = 'event_search'
+SEARCH_COLUMNS = ('title', 'description', 'tags', 'location', 'location_name', 'organizer_name')
+
+# bm25 column weights, in SEARCH_COLUMNS order
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0, 3.0, 3.0, 2.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_expression(query):
+    """
+    Turn free text into a safe FTS5 MATCH expression: every word must match,
+    and the last word also matches as a prefix so results update while typing.
+    """
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' AND '.join(terms)
+
+
+def index_event(event):
+    if not search_enabled():
+        return
+    values = [getattr(event, column) or '' for column in SEARCH_COLUMNS]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [event.pk])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, {", ".join(SEARCH_COLUMNS)}) '
+            f'VALUES (%s, {", ".join(["%s"] * len(SEARCH_COLUMNS))})',
+            [event.pk, *values],
+        )
+
+
+def remove_event(event_id):
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [event_id])
+
+
+def rebuild_index():
+    """Repopulate the whole index from the event table in one statement."""
+    if not search_enabled():
+        return 0
+    columns = ', '.join(SEARCH_COLUMNS)
+    sources = ', '.join(f"COALESCE({column}, '')" for column in SEARCH_COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, {columns}) '
+            f'SELECT id, {sources} FROM {Event._meta.db_table}'
+        )
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def search_event_ids(query, limit):
+    """Event ids matching `query`, best match first."""
+    expression = build_match_expression(query)
+    if expression is None:
+        return []
+    if not search_enabled():
+        # Unranked fallback for databases without FTS5
+        condition = Q()
+        for token in TOKEN_RE.findall(query):
+            any_column = Q()
+            for column in SEARCH_COLUMNS:
+                any_column |= Q(**{f'{column}__icontains': token})
+            condition &= any_column
+        queryset = Event.objects.filter(condition).order_by('-date')
+        return list(queryset.values_list('id', flat=True)[:limit])
+    weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+            f'ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT %s',
+            [expression, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -1,6 +1,24 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Event, Notification, ChatMessage, Favorite, Profile, Booking, Review, EventImage
+from .models import Event, Notification, ChatMessage, Favorite, Profile, Booking, Review, EventImage, Tag, WaitlistEntry
+from .images import variant_urls, variants_field
+
+# ----------------------------
+# Image variants
+# ----------------------------
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URLs of an image field's resized variants (see event.images), null until they exist."""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        super().__init__(source='*', **kwargs)
+
+    def to_representation(self, instance):
+        return variant_urls(
+            getattr(instance, self.image_field),
+            getattr(instance, variants_field(self.image_field)),
+            self.context.get('request'),
+        )
 
 # ----------------------------
 # User Serializer
@@ -15,41 +33,99 @@ class UserSerializer(serializers.ModelSerializer):
 # ----------------------------
 class ProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    avatar_variants = ImageVariantsField('avatar')
     name = serializers.CharField(source='user.get_full_name', read_only=True)
     email = serializers.EmailField(source='user.email', read_only=True)
 
     class Meta:
         model = Profile
         fields = [
-            'id', 'user', 'name', 'email', 'bio', 'hobbies', 'avatar', 'phone', 'location',
+            'id', 'user', 'name', 'email', 'bio', 'hobbies', 'avatar', 'avatar_variants', 'phone', 'location',
             'full_name', 'citizenship_number', 'document_image', 'is_kyc_verified', 'kyc_submitted_at'
         ]
         read_only_fields = ['is_kyc_verified', 'kyc_submitted_at']
 
 class EventImageSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField('image')
+
     class Meta:
         model = EventImage
-        fields = ['id', 'image', 'created_at']
+        fields = ['id', 'image', 'image_variants', 'created_at']
+
+class TagSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        fields = ['id', 'name', 'slug', 'event_count']
 
 # ----------------------------
 # Event Serializer
 # ----------------------------
 class EventSerializer(serializers.ModelSerializer):
+    """
+    Read responses can be trimmed with query parameters, which also apply
+    to events nested in favorites and bookings:
+
+    - ``?view=card`` returns the compact CARD_FIELDS used by list screens
+    - ``?fields=title,date`` returns only the named fields (plus ``id``)
+    - ``?expand=participants,images`` adds relations to a trimmed response
+    """
+    CARD_FIELDS = (
+        'id', 'title', 'date', 'location', 'category', 'image', 'image_variants', 'ticket_price', 'is_free_event',
+        'rating_avg', 'rating_count',
+    )
+    RELATED_FIELDS = ('created_by', 'participants', 'images')
+
     created_by = UserSerializer(read_only=True)
     participants = UserSerializer(many=True, read_only=True)
     images = EventImageSerializer(many=True, read_only=True)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+    image_variants = ImageVariantsField('image')
 
     class Meta:
         model = Event
         fields = [
-            'id', 'title', 'description', 'date', 'location', 'category', 'image',
-            'tags', 'start_date_time', 'end_date_time', 'location_name', 'map_link',
-            'min_participants', 'max_participants', 'gender_preference', 'age_limit', 'prior_experience_required',
+            'id', 'title', 'description', 'date', 'location', 'category', 'image', 'image_variants',
+            'tags', 'start_date_time', 'end_date_time', 'location_name', 'map_link', 'latitude', 'longitude',
+            'min_participants', 'max_participants', 'seats_taken', 'gender_preference', 'age_limit', 'prior_experience_required',
             'is_free_event', 'ticket_price', 'pay_on_site', 'equipment_list',
             'organizer_name', 'contact_email', 'phone_number', 'social_media_link',
+            'rating_avg', 'rating_count', 'rating_histogram',
             'created_by', 'participants', 'images', 'created_at', 'updated_at'
         ]
 
+    def validate(self, attrs):
+        latitude = attrs.get('latitude', getattr(self.instance, 'latitude', None))
+        longitude = attrs.get('longitude', getattr(self.instance, 'longitude', None))
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError('latitude and longitude must be provided together')
+        if latitude is not None and not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise serializers.ValidationError('Coordinates are out of range')
+        return attrs
+
+    @classmethod
+    def requested_fields(cls, request):
+        """Field names selected by the request, or None for the full representation."""
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        params = request.query_params
+        if params.get('fields'):
+            selected = {'id'} | {name.strip() for name in params['fields'].split(',')}
+        elif params.get('view') == 'card':
+            selected = set(cls.CARD_FIELDS)
+        else:
+            return None
+        if params.get('expand'):
+            selected |= {name.strip() for name in params['expand'].split(',')}
+        return selected & set(cls.Meta.fields)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.requested_fields(self.context.get('request'))
+        if selected is not None:
+            for name in set(fields) - selected:
+                fields.pop(name)
+        return fields
+
 # ----------------------------
 # Booking Serializer
 # ----------------------------
@@ -66,6 +142,42 @@ class BookingSerializer(serializers.ModelSerializer):
         model = Booking
         fields = ['id', 'user', 'event', 'event_id', 'booked_at', 'status', 'ticket_count']
 
+    def validate_ticket_count(self, value):
+        if value < 1:
+            raise serializers.ValidationError('Book at least one ticket.')
+        return value
+
+class BulkBookingItemSerializer(serializers.Serializer):
+    event_id = serializers.IntegerField()
+    user_id = serializers.IntegerField(required=False)
+    ticket_count = serializers.IntegerField(min_value=1, default=1)
+
+
+class BulkBookingSerializer(serializers.Serializer):
+    """Envelope of a bulk booking; items are validated one by one so a bad item fails alone."""
+    bookings = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    all_or_nothing = serializers.BooleanField(default=False)
+
+    def validate_bookings(self, value):
+        from .bookings import MAX_BULK_BOOKINGS
+        if len(value) > MAX_BULK_BOOKINGS:
+            raise serializers.ValidationError(f'At most {MAX_BULK_BOOKINGS} bookings per request.')
+        return value
+
+# ----------------------------
+# Waitlist Serializer
+# ----------------------------
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WaitlistEntry
+        fields = ['id', 'event', 'ticket_count', 'created_at']
+        read_only_fields = ['event']
+
+    def validate_ticket_count(self, value):
+        if value < 1:
+            raise serializers.ValidationError('Request at least one ticket.')
+        return value
+
 # ----------------------------
 # Review Serializer
 # ----------------------------
@@ -76,6 +188,11 @@ class ReviewSerializer(serializers.ModelSerializer):
         model = Review
         fields = ['id', 'user', 'event', 'rating', 'comment', 'created_at']
 
+    def validate_rating(self, value):
+        if not 1 <= value <= 5:
+            raise serializers.ValidationError('Rating must be between 1 and 5.')
+        return value
+
 # ----------------------------
 # Notification Serializer
 # ----------------------------
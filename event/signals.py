@@ -0,0 +1,212 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import authentication, bookings, cache, images, notifications, ratings, realtime, search, tags
+from .models import Booking, ChatMessage, Event, EventImage, Favorite, Profile, Review
+
+
+# ----------------------------
+# Search index sync
+# ----------------------------
+@receiver(post_save, sender=Event)
+def index_event_for_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_event(instance)
+
+
+@receiver(post_delete, sender=Event)
+def remove_event_from_search(sender, instance, **kwargs):
+    search.remove_event(instance.pk)
+
+
+# ----------------------------
+# Tag index sync
+# ----------------------------
+@receiver(post_save, sender=Event)
+def sync_event_tags(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tags.sync_event_tags(instance)
+
+
+@receiver(pre_delete, sender=Event)
+def release_event_tags(sender, instance, **kwargs):
+    tags.release_event_tags(instance)
+
+
+# ----------------------------
+# Response cache invalidation
+# ----------------------------
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event(sender, instance, **kwargs):
+    cache.bump_versions([instance.pk])
+
+
+@receiver(post_save, sender=EventImage)
+@receiver(post_delete, sender=EventImage)
+def invalidate_related_event(sender, instance, **kwargs):
+    touch_events([instance.event_id])
+    cache.bump_versions([instance.event_id])
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_favorite_ids(sender, instance, **kwargs):
+    cache.bump_favorites_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Event.participants.through)
+def invalidate_participants(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # Remember which events the user leaves; they are gone by post_clear
+        instance._cleared_event_ids = list(instance.events_participating.values_list('id', flat=True))
+        return
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        event_ids = [instance.pk]
+    elif action == 'post_clear':
+        event_ids = instance.__dict__.pop('_cleared_event_ids', [])
+    else:
+        event_ids = list(pk_set)
+    touch_events(event_ids)
+    cache.bump_versions(event_ids)
+
+
+def touch_events(event_ids):
+    """Nested images and participants are part of an event; keep Last-Modified honest."""
+    if event_ids:
+        Event.objects.filter(pk__in=event_ids).update(updated_at=timezone.now())
+
+
+# ----------------------------
+# Chat broadcast
+# ----------------------------
+@receiver(post_save, sender=ChatMessage)
+def broadcast_chat_message(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: realtime.publish_chat_message(instance))
+
+
+# ----------------------------
+# Event change announcements
+# ----------------------------
+@receiver(pre_save, sender=Event)
+def remember_announced_fields(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    previous = Event.objects.filter(pk=instance.pk).values(*notifications.ANNOUNCED_FIELDS, 'max_participants').first()
+    if previous:
+        instance._announced_changes = [
+            field for field in notifications.ANNOUNCED_FIELDS
+            if previous[field] != getattr(instance, field)
+        ]
+        instance._capacity_raised = previous['max_participants'] is not None and (
+            instance.max_participants is None or instance.max_participants > previous['max_participants']
+        )
+
+
+@receiver(post_save, sender=Event)
+def announce_event_changes(sender, instance, created, raw=False, **kwargs):
+    changed = instance.__dict__.pop('_announced_changes', None)
+    if created or raw or not changed:
+        return
+    changes = ', '.join(Event._meta.get_field(field).verbose_name for field in changed)
+    transaction.on_commit(
+        lambda: notifications.notify_event_audience(instance, notifications.EVENT_CHANGED_TEMPLATE, changes=changes)
+    )
+
+
+# ----------------------------
+# Seat accounting
+# ----------------------------
+@receiver(post_delete, sender=Booking)
+def release_deleted_booking_seats(sender, instance, **kwargs):
+    if instance.status in bookings.HOLDING_STATUSES:
+        bookings.release_seats(instance.event_id, instance.ticket_count)
+
+
+# ----------------------------
+# Waitlist
+# ----------------------------
+@receiver(post_delete, sender=Booking)
+def promote_waitlist_on_booking_delete(sender, instance, **kwargs):
+    if instance.status in bookings.HOLDING_STATUSES:
+        event_id = instance.event_id
+        transaction.on_commit(lambda: bookings.promote_waitlist(event_id))
+
+
+@receiver(post_save, sender=Event)
+def promote_waitlist_on_capacity_increase(sender, instance, created, raw=False, **kwargs):
+    if instance.__dict__.pop('_capacity_raised', False) and not raw:
+        transaction.on_commit(lambda: bookings.promote_waitlist(instance.pk))
+
+
+# ----------------------------
+# Review aggregates
+# ----------------------------
+# ratings.adjust also bumps the event's cache version
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk is not None:
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list('event_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def count_saved_review(sender, instance, created, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_previous_rating', None)
+    if raw:
+        return
+    if previous is None:
+        ratings.adjust(instance.event_id, added=instance.rating)
+    elif previous[0] == instance.event_id:
+        ratings.adjust(instance.event_id, removed=previous[1], added=instance.rating)
+    else:
+        ratings.adjust(previous[0], removed=previous[1])
+        ratings.adjust(instance.event_id, added=instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def uncount_deleted_review(sender, instance, **kwargs):
+    ratings.adjust(instance.event_id, removed=instance.rating)
+
+
+# ----------------------------
+# Token authentication cache
+# ----------------------------
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    authentication.get_token_cache().revoke(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_changed_user(sender, instance, **kwargs):
+    # Covers deactivation as well as any other change to the cached user
+    authentication.get_token_cache().revoke_user(instance.pk)
+
+
+# ----------------------------
+# Image variants
+# ----------------------------
+# Generated after commit, so a failed save never leaves files behind
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=EventImage)
+@receiver(post_save, sender=Profile)
+def generate_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw and not images.is_current(instance, images.IMAGE_FIELDS[sender]):
+        transaction.on_commit(lambda: images.refresh_variants(instance))
+
+
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=EventImage)
+@receiver(post_delete, sender=Profile)
+def delete_image_variants(sender, instance, **kwargs):
+    fieldfile = getattr(instance, images.IMAGE_FIELDS[sender])
+    variants = getattr(instance, images.variants_field(images.IMAGE_FIELDS[sender]))
+    if variants:
+        transaction.on_commit(lambda: images.delete_variants(fieldfile.storage, variants))
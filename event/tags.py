@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import EventTag, Tag
+
+
+def parse_tags(value):
+    """'Adventure, Trekking,adventure' -> {'adventure': 'Adventure', 'trekking': 'Trekking'}"""
+    tags = {}
+    for name in (value or '').split(','):
+        name = ' '.join(name.split())[:100]
+        if name:
+            tags.setdefault(name.lower(), name)
+    return tags
+
+
+def parse_slugs(value):
+    return list(parse_tags(value))
+
+
+def sync_event_tags(event):
+    """Bring the event's EventTag rows and Tag counters in line with `event.tags`."""
+    wanted = parse_tags(event.tags)
+    current = dict(EventTag.objects.filter(event=event).values_list('tag__slug', 'tag_id'))
+    added = set(wanted) - set(current)
+    removed = set(current) - set(wanted)
+    if not added and not removed:
+        return
+
+    with transaction.atomic():
+        if removed:
+            removed_ids = [current[slug] for slug in removed]
+            EventTag.objects.filter(event=event, tag_id__in=removed_ids).delete()
+            Tag.objects.filter(id__in=removed_ids).update(event_count=F('event_count') - 1)
+        if added:
+            Tag.objects.bulk_create(
+                [Tag(slug=slug, name=wanted[slug]) for slug in added],
+                ignore_conflicts=True,
+            )
+            tag_ids = list(Tag.objects.filter(slug__in=added).values_list('id', flat=True))
+            EventTag.objects.bulk_create([EventTag(event=event, tag_id=tag_id) for tag_id in tag_ids])
+            Tag.objects.filter(id__in=tag_ids).update(event_count=F('event_count') + 1)
+
+
+def release_event_tags(event):
+    """Decrement counters for an event about to be deleted; its links cascade."""
+    Tag.objects.filter(event_links__event=event).update(event_count=F('event_count') - 1)
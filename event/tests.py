@@ -1,3 +1,1530 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import authentication, bookings, geo, images, login, notifications, throttling, urls as event_urls
+from .models import (
+    ChatArchiveSegment, Event, EventImage, Notification, ChatMessage, Favorite, Profile, Booking, Review, Tag,
+    WaitlistEntry,
+)
+from .cache import event_version_key
+from .realtime import chat_application
+from .serializers import EventSerializer
+
+
+# Tests clear the cache freely, so keep them off the shared on-disk default
+# that a server on the same host may be using
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    'throttle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-throttle'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class APITestCase(TestCase):
+    """Response caches outlive the per-test database rollback, so start empty."""
+
+    def setUp(self):
+        cache.clear()
+        throttling.counters().clear()
+        authentication.get_token_cache().clear()
+
+
+def make_event(creator, **kwargs):
+    defaults = {
+        'title': 'Annapurna Circuit Expedition',
+        'description': 'A legendary trek through the heart of the Himalayas.',
+        'date': timezone.now() + timedelta(days=7),
+        'location': 'Annapurna Region',
+        'created_by': creator,
+    }
+    defaults.update(kwargs)
+    return Event.objects.create(**defaults)
+
+
+# ----------------------------
+# Query budgets
+# ----------------------------
+class QueryBudgetTests(APITestCase):
+    """
+    Every GET endpoint in event/urls.py declares the maximum number of
+    queries it may issue. Budgets must hold regardless of how many rows
+    the response contains, so each endpoint is measured at two sizes.
+    """
+
+    # url name -> (max queries, url kwargs, query string)
+    QUERY_BUDGETS = {
+        'event-list-create': (5, {}, ''),
+        'event-search': (4, {}, 'q=event'),
+        'event-map': (1, {}, 'bbox=-180,-90,180,90'),
+        'event-detail': (4, {'pk': 'event'}, ''),
+        'tag-list': (1, {}, ''),
+        'notification-list': (2, {}, ''),
+        'notification-unread-count': (1, {}, ''),
+        'chatmessage-list-create': (2, {'event_id': 'event'}, ''),
+        'favorite-list-create': (4, {}, ''),
+        'favorite-ids': (1, {}, ''),
+        'profile-detail': (2, {}, ''),
+        'booking-list-create': (4, {}, ''),
+        'event-waitlist': (2, {'event_id': 'event'}, ''),
+        'review-list': (1, {}, ''),
+        'event-reviews': (1, {'event_id': 'event'}, ''),
+        'user-list': (1, {}, ''),
+    }
+
+    # POST-only and admin-only endpoints, covered by their own tests
+    EXEMPT = {'login', 'logout', 'signup', 'favorite-detail', 'notification-mark-read', 'booking-cancel',
+              'booking-bulk', 'token-cache-stats'}
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('trekker', 'trekker@example.com', 'password123')
+        Profile.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.event = None
+
+    def seed(self, count):
+        users = [
+            User.objects.create_user(f'guest{User.objects.count()}_{i}', f'guest{i}@example.com')
+            for i in range(3)
+        ]
+        for i in range(count):
+            event = make_event(users[i % len(users)], title=f'Event {i}')
+            event.participants.add(self.user, *users)
+            EventImage.objects.create(event=event, image='event_gallery/test.jpg')
+            Favorite.objects.create(user=self.user, event=event)
+            Booking.objects.create(user=self.user, event=event)
+            WaitlistEntry.objects.create(user=self.user, event=event)
+            Review.objects.create(user=users[0], event=event, rating=4, comment='Great')
+            ChatMessage.objects.create(event=event, sender=users[i % len(users)], message='Hello')
+            Notification.objects.create(user=self.user, message=f'Booked {event.title}')
+            self.event = self.event or event
+
+    def count_queries(self, name, kwargs, query):
+        resolved = {key: getattr(self, value).pk for key, value in kwargs.items()}
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(name, kwargs=resolved), QUERY_STRING=query)
+        self.assertEqual(response.status_code, 200, name)
+        return len(ctx.captured_queries)
+
+    def test_every_endpoint_declares_a_budget(self):
+        names = {p.name for p in event_urls.urlpatterns if isinstance(p, URLPattern)}
+        missing = names - set(self.QUERY_BUDGETS) - self.EXEMPT
+        self.assertFalse(missing, f'Endpoints without a query budget: {sorted(missing)}')
+
+    def test_endpoints_stay_within_budget(self):
+        self.seed(2)
+        small = {name: self.count_queries(name, *params) for name, (_, *params) in self.QUERY_BUDGETS.items()}
+        self.seed(8)
+        for name, (budget, *params) in self.QUERY_BUDGETS.items():
+            with self.subTest(endpoint=name):
+                large = self.count_queries(name, *params)
+                self.assertLessEqual(large, budget)
+                self.assertEqual(large, small[name], 'query count grows with row count')
+
+
+# ----------------------------
+# Event feed pagination
+# ----------------------------
+class EventCursorPaginationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.client = APIClient()
+        same_day = timezone.now() + timedelta(days=3)
+        # Several events share a date so the id tiebreaker is exercised
+        for i in range(7):
+            make_event(self.user, title=f'Event {i}', date=same_day if i % 2 else same_day + timedelta(hours=i))
+
+    def test_walks_every_event_once_in_feed_order(self):
+        expected = list(Event.objects.order_by('-date', '-id').values_list('id', flat=True))
+        seen, url = [], reverse('event-list-create') + '?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_preceding_page(self):
+        first = self.client.get(reverse('event-list-create') + '?page_size=3').data
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual([e['id'] for e in back['results']], [e['id'] for e in first['results']])
+
+    def test_page_size_is_bounded(self):
+        response = self.client.get(reverse('event-list-create') + '?page_size=100000')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 7)
+
+    def test_rejects_malformed_cursor(self):
+        response = self.client.get(reverse('event-list-create') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_rejects_cursor_with_mistyped_values(self):
+        for values in (['abc', 1], [None, 1], [timezone.now().isoformat(), 'x'], [{}, []]):
+            cursor = base64.urlsafe_b64encode(json.dumps({'k': values, 'o': '-date,-id'}).encode()).decode()
+            response = self.client.get(reverse('event-list-create'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, values)
+
+
+# ----------------------------
+# Sparse fieldsets
+# ----------------------------
+class EventFieldSelectionTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.event = make_event(self.user)
+        self.event.participants.add(self.user)
+        EventImage.objects.create(event=self.event, image='event_gallery/test.jpg')
+        Favorite.objects.create(user=self.user, event=self.event)
+        self.client = APIClient()
+
+    def test_card_view_skips_relation_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('event-list-create') + '?view=card')
+        event = response.data['results'][0]
+        self.assertEqual(set(event), set(EventSerializer.CARD_FIELDS))
+        sql = ' '.join(query['sql'] for query in ctx.captured_queries)
+        self.assertNotIn('auth_user', sql)
+        self.assertNotIn('event_eventimage', sql)
+
+    def test_fields_and_expand(self):
+        url = reverse('event-detail', kwargs={'pk': self.event.pk})
+        response = self.client.get(url + '?fields=title,bogus&expand=participants')
+        self.assertEqual(set(response.data), {'id', 'title', 'participants'})
+        self.assertEqual(response.data['participants'][0]['username'], 'organizer')
+
+    def test_default_is_full_representation(self):
+        response = self.client.get(reverse('event-detail', kwargs={'pk': self.event.pk}))
+        self.assertEqual(set(response.data), set(EventSerializer.Meta.fields))
+
+    def test_card_view_applies_to_nested_favorites(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('favorite-list-create') + '?view=card')
+        self.assertEqual(set(response.data[0]['event']), set(EventSerializer.CARD_FIELDS))
+
+
+# ----------------------------
+# Full-text search
+# ----------------------------
+class EventSearchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.everest = make_event(self.user, title='Everest Base Camp Trek', tags='Adventure, Trekking')
+        self.festival = make_event(
+            self.user, title='Pokhara Street Festival', description='Food stalls near the Everest view point',
+            location='Pokhara',
+        )
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get(reverse('event-search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [event['id'] for event in response.data]
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search('everest'), [self.everest.id, self.festival.id])
+
+    def test_prefix_and_multiple_terms(self):
+        self.assertEqual(self.search('pokhara fest'), [self.festival.id])
+        self.assertEqual(self.search('trekk'), [self.everest.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.festival.title = 'Lakeside Lantern Night'
+        self.festival.save()
+        self.assertEqual(self.search('lantern'), [self.festival.id])
+        self.festival.delete()
+        self.assertEqual(self.search('lantern'), [])
+
+    def test_rebuild_command_indexes_rows_written_without_signals(self):
+        Event.objects.filter(pk=self.everest.pk).update(title='Manaslu Circuit')
+        self.assertEqual(self.search('manaslu'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('manaslu'), [self.everest.id])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('"everest" OR NOT ('), [])
+        self.assertEqual(self.search('***'), [])
+
+
+# ----------------------------
+# Geo proximity and clustering
+# ----------------------------
+class EventGeoTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.thamel = make_event(self.user, title='Thamel Food Walk', latitude=27.7154, longitude=85.3123)
+        self.patan = make_event(self.user, title='Patan Durbar Square', latitude=27.6727, longitude=85.3253)
+        self.pokhara = make_event(self.user, title='Phewa Lake Boating', latitude=28.2096, longitude=83.9856)
+        self.nowhere = make_event(self.user, title='Online Meetup')
+        self.client = APIClient()
+
+    def near(self, point, radius):
+        response = self.client.get(reverse('event-list-create'), {'near': point, 'radius': radius})
+        self.assertEqual(response.status_code, 200)
+        return {event['id'] for event in response.data['results']}
+
+    def test_geohash_is_maintained_on_save(self):
+        self.assertEqual(self.thamel.geohash[:5], geo.encode(27.7154, 85.3123, 5))
+        self.assertEqual(self.nowhere.geohash, '')
+
+    def test_near_filter_uses_exact_distance(self):
+        self.assertEqual(self.near('27.7172,85.3240', 2), {self.thamel.id})
+        self.assertEqual(self.near('27.7172,85.3240', 10), {self.thamel.id, self.patan.id})
+        self.assertEqual(self.near('27.7172,85.3240', 200), {self.thamel.id, self.patan.id, self.pokhara.id})
+
+    def test_distance_refine_runs_in_the_database(self):
+        point, radius = (27.7172, 85.3240), geo.haversine_km(27.7172, 85.3240, 27.6727, 85.3253)
+        with CaptureQueriesContext(connection) as queries:
+            ids = set(geo.filter_near(Event.objects.all(), *point, radius + 0.01).values_list('id', flat=True))
+        self.assertEqual(ids, {self.thamel.id, self.patan.id})
+        self.assertEqual(len(queries), 1)
+        nearer = geo.filter_near(Event.objects.all(), *point, radius - 0.01)
+        self.assertNotIn(self.patan.id, nearer.values_list('id', flat=True))
+
+    def test_near_filter_validates_input(self):
+        response = self.client.get(reverse('event-list-create'), {'near': 'kathmandu'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('event-list-create'), {'near': '27.7,85.3', 'radius': 10000})
+        self.assertEqual(response.status_code, 400)
+
+    def test_map_clusters_nearby_events(self):
+        response = self.client.get(reverse('event-map'), {'bbox': '80,26,89,31'})
+        clusters = response.data['clusters']
+        self.assertEqual(sum(c['count'] for c in clusters), 3)
+        self.assertLessEqual(len(clusters), 64)
+        zoomed = self.client.get(reverse('event-map'), {'bbox': '85.30,27.66,85.34,27.72'}).data['clusters']
+        self.assertEqual({c['event_id'] for c in zoomed}, {self.thamel.id, self.patan.id})
+
+    def test_covering_cells_include_every_corner(self):
+        box = (27.6, 85.2, 27.8, 85.5)
+        cells = geo.covering_cells(*box)
+        for lat in (box[0], box[2]):
+            for lon in (box[1], box[3]):
+                self.assertTrue(any(geo.encode(lat, lon).startswith(cell) for cell in cells))
+
+
+# ----------------------------
+# Faceted filtering
+# ----------------------------
+class EventFacetTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        make_event(self.user, category='Trekking', ticket_price=1200, is_free_event=False, prior_experience_required=True)
+        make_event(self.user, category='Trekking', ticket_price=0)
+        make_event(self.user, category='Cultural', ticket_price=45, is_free_event=False)
+        make_event(self.user, category='Cultural', ticket_price=0, gender_preference='female')
+        self.client = APIClient()
+
+    def get(self, **params):
+        response = self.client.get(reverse('event-list-create'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def counts(self, data, facet):
+        return {row['value']: row['count'] for row in data['facets'][facet]}
+
+    def test_filters_combine(self):
+        data = self.get(category='Trekking,Cultural', is_free_event='false')
+        self.assertEqual(len(data['results']), 2)
+        data = self.get(price='under_100,1000_plus')
+        self.assertEqual({e['ticket_price'] for e in data['results']}, {'45.00', '1200.00'})
+
+    def test_facet_counts_ignore_their_own_selection(self):
+        data = self.get(category='Trekking')
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(self.counts(data, 'category'), {'Trekking': 2, 'Cultural': 2})
+        self.assertEqual(self.counts(data, 'price'), {'free': 1, '1000_plus': 1})
+        self.assertEqual(self.counts(data, 'prior_experience_required'), {True: 1, False: 1})
+
+    def test_facets_are_computed_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.get(view='card', gender_preference='any')
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_facets_only_on_first_page(self):
+        first = self.get(page_size=2)
+        self.assertNotIn('facets', self.client.get(first['next']).data)
+
+    def test_rejects_unknown_values(self):
+        self.assertEqual(self.client.get(reverse('event-list-create'), {'price': 'cheap'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('event-list-create'), {'is_free_event': 'maybe'}).status_code, 400)
+
+
+# ----------------------------
+# Tag index
+# ----------------------------
+class EventTagTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.trek = make_event(self.user, tags='Adventure, Trekking, Mountains')
+        self.rafting = make_event(self.user, tags='adventure,Rafting')
+        self.walk = make_event(self.user, tags='Culture')
+        self.client = APIClient()
+
+    def filter(self, **params):
+        response = self.client.get(reverse('event-list-create'), params)
+        self.assertEqual(response.status_code, 200)
+        return {event['id'] for event in response.data['results']}
+
+    def counts(self):
+        return dict(Tag.objects.values_list('slug', 'event_count'))
+
+    def test_tags_are_normalized_and_counted(self):
+        self.assertEqual(self.counts(), {'adventure': 2, 'trekking': 1, 'mountains': 1, 'rafting': 1, 'culture': 1})
+        self.assertEqual(Tag.objects.get(slug='adventure').name, 'Adventure')
+
+    def test_any_and_all_filters(self):
+        self.assertEqual(self.filter(tags='Trekking,rafting'), {self.trek.id, self.rafting.id})
+        self.assertEqual(self.filter(tags='adventure,rafting', tag_mode='all'), {self.rafting.id})
+        self.assertEqual(self.filter(tags='unknown'), set())
+
+    def test_counts_follow_edits_and_deletes(self):
+        self.trek.tags = 'Trekking, Photography'
+        self.trek.save()
+        self.rafting.delete()
+        counts = self.counts()
+        self.assertEqual(counts['adventure'], 0)
+        self.assertEqual(counts['photography'], 1)
+        self.assertEqual(counts['rafting'], 0)
+
+    def test_tag_cloud(self):
+        response = self.client.get(reverse('tag-list'), {'limit': 2})
+        self.assertEqual([tag['slug'] for tag in response.data][:1], ['adventure'])
+        self.assertEqual(len(response.data), 2)
+
+
+# ----------------------------
+# Versioned response cache
+# ----------------------------
+class EventResponseCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.guest = User.objects.create_user('guest', 'guest@example.com', 'password123')
+        self.event = make_event(self.user, title='Everest Base Camp Trek')
+        self.other = make_event(self.user, title='Pokhara Street Festival')
+        self.client = APIClient()
+        self.detail_url = reverse('event-detail', kwargs={'pk': self.event.pk})
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_repeat_reads_are_served_from_cache_without_queries(self):
+        self.assertEqual(self.get(self.detail_url)['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        # Only the conditional GET validator lookup remains
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_writes_invalidate_detail_and_feed(self):
+        self.get(self.detail_url)
+        self.get(reverse('event-list-create'))
+        self.event.title = 'Everest Summit Push'
+        self.event.save()
+        self.assertEqual(self.get(self.detail_url).data['title'], 'Everest Summit Push')
+        titles = [e['title'] for e in self.get(reverse('event-list-create')).data['results']]
+        self.assertIn('Everest Summit Push', titles)
+
+    def test_related_writes_invalidate(self):
+        self.get(self.detail_url)
+        self.event.participants.add(self.guest)
+        self.assertEqual(len(self.get(self.detail_url).data['participants']), 1)
+        EventImage.objects.create(event=self.event, image='event_gallery/test.jpg')
+        self.assertEqual(len(self.get(self.detail_url).data['images']), 1)
+        self.guest.events_participating.clear()
+        self.assertEqual(self.get(self.detail_url).data['participants'], [])
+
+    def test_unrelated_event_write_keeps_detail_cached(self):
+        self.get(self.detail_url)
+        self.other.title = 'Lakeside Lantern Night'
+        self.other.save()
+        self.assertEqual(self.get(self.detail_url)['X-Cache'], 'HIT')
+        self.assertEqual(self.get(reverse('event-list-create'))['X-Cache'], 'MISS')
+
+    def test_versions_survive_eviction(self):
+        self.get(self.detail_url)
+        cache.delete(event_version_key(self.event.pk))
+        self.assertEqual(self.get(self.detail_url)['X-Cache'], 'MISS')
+
+
+# ----------------------------
+# Conditional GET
+# ----------------------------
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        Profile.objects.create(user=self.user)
+        Notification.objects.create(user=self.user, message='Welcome aboard')
+        self.event = make_event(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_revalidates(self, url, change):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertLessEqual(len(ctx.captured_queries), 1)
+        change()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_event_detail(self):
+        guest = User.objects.create_user('guest', 'guest@example.com')
+        url = reverse('event-detail', kwargs={'pk': self.event.pk})
+        self.assert_revalidates(url, lambda: self.event.participants.add(guest))
+
+    def test_event_detail_etag_depends_on_representation(self):
+        url = reverse('event-detail', kwargs={'pk': self.event.pk})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url + '?view=card', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_profile(self):
+        def change():
+            self.user.profile.bio = 'Trekking guide'
+            self.user.profile.save()
+        self.assert_revalidates(reverse('profile-detail'), change)
+
+    def test_notifications(self):
+        notification = self.user.notifications.get()
+        def change():
+            notification.is_read = True
+            notification.save()
+        self.assert_revalidates(reverse('notification-list'), change)
+
+    def test_if_modified_since(self):
+        url = reverse('event-detail', kwargs={'pk': self.event.pk})
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_missing_event_is_still_404(self):
+        response = self.client.get(reverse('event-detail', kwargs={'pk': 999}), HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(response.status_code, 404)
+
+
+# ----------------------------
+# WebSocket chat
+# ----------------------------
+class WebSocketClient:
+    def __init__(self, path, token=None):
+        query = f'token={token}' if token else ''
+        self.scope = {'type': 'websocket', 'path': path, 'query_string': query.encode(), 'headers': []}
+        self.inbox, self.outbox = asyncio.Queue(), asyncio.Queue()
+
+    async def connect(self):
+        self.task = asyncio.ensure_future(chat_application(self.scope, self.inbox.get, self.outbox.put))
+        await self.inbox.put({'type': 'websocket.connect'})
+        return await self.next()
+
+    async def next(self):
+        return await asyncio.wait_for(self.outbox.get(), timeout=5)
+
+    async def send(self, data):
+        await self.inbox.put({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def close(self):
+        await self.inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, timeout=5)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ChatWebSocketTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        throttling.counters().clear()
+        authentication.get_token_cache().clear()
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.guest = User.objects.create_user('guest', 'guest@example.com', 'password123')
+        self.token = Token.objects.create(user=self.user).key
+        self.guest_token = Token.objects.create(user=self.guest).key
+        self.event = make_event(self.user)
+        self.path = f'/ws/events/{self.event.pk}/chat/'
+
+    def test_rejects_missing_or_bad_token_and_unknown_events(self):
+        async def scenario():
+            self.assertEqual((await WebSocketClient(self.path).connect())['code'], 4401)
+            self.assertEqual((await WebSocketClient(self.path, 'nope').connect())['code'], 4401)
+            missing = WebSocketClient('/ws/events/999/chat/', self.token)
+            self.assertEqual((await missing.connect())['code'], 4404)
+        async_to_sync(scenario)()
+
+    def test_messages_are_broadcast_to_the_room(self):
+        async def scenario():
+            organizer, guest = WebSocketClient(self.path, self.token), WebSocketClient(self.path, self.guest_token)
+            self.assertEqual((await organizer.connect())['type'], 'websocket.accept')
+            self.assertEqual((await guest.connect())['type'], 'websocket.accept')
+            await guest.send({'message': 'Namaste!'})
+            for client in (organizer, guest):
+                payload = json.loads((await client.next())['text'])
+                self.assertEqual(payload['message']['message'], 'Namaste!')
+                self.assertEqual(payload['message']['sender']['username'], 'guest')
+            await guest.send({'text': 'wrong shape'})
+            self.assertEqual(json.loads((await guest.next())['text'])['type'], 'error')
+            await organizer.close()
+            await guest.close()
+        async_to_sync(scenario)()
+        self.assertEqual(ChatMessage.objects.filter(event=self.event).count(), 1)
+
+    def test_messages_posted_over_rest_are_pushed(self):
+        client = APIClient()
+        client.force_authenticate(self.guest)
+        url = reverse('chatmessage-list-create', kwargs={'event_id': self.event.pk})
+
+        async def scenario():
+            socket = WebSocketClient(self.path, self.token)
+            await socket.connect()
+            await sync_to_async(client.post)(url, {'message': 'Meet at the trailhead'})
+            payload = json.loads((await socket.next())['text'])
+            self.assertEqual(payload['message']['message'], 'Meet at the trailhead')
+            await socket.close()
+        async_to_sync(scenario)()
+
+
+# ----------------------------
+# Chat history windows
+# ----------------------------
+class ChatHistoryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.event = make_event(self.user)
+        other = make_event(self.user)
+        self.messages = [
+            ChatMessage.objects.create(event=self.event, sender=self.user, message=f'Message {i}') for i in range(7)
+        ]
+        ChatMessage.objects.create(event=other, sender=self.user, message='Elsewhere')
+        self.url = reverse('chatmessage-list-create', kwargs={'event_id': self.event.pk})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [m['id'] for m in response.data['results']], response.data['has_more']
+
+    def ids(self, start, stop):
+        return [m.id for m in self.messages[start:stop]]
+
+    def test_default_window_is_latest_messages_oldest_first(self):
+        self.assertEqual(self.get(limit=3), (self.ids(4, 7), True))
+        self.assertEqual(self.get(), (self.ids(0, 7), False))
+
+    def test_scroll_back_with_before(self):
+        self.assertEqual(self.get(limit=3, before=self.messages[4].id), (self.ids(1, 4), True))
+        self.assertEqual(self.get(limit=3, before=self.messages[1].id), (self.ids(0, 1), False))
+
+    def test_delta_sync_with_after(self):
+        self.assertEqual(self.get(limit=3, after=self.messages[2].id), (self.ids(3, 6), True))
+        self.assertEqual(self.get(after=self.messages[6].id), ([], False))
+
+    def test_rejects_bad_cursors(self):
+        self.assertEqual(self.client.get(self.url, {'before': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'before': 1, 'after': 2}).status_code, 400)
+
+
+# ----------------------------
+# Chat archive
+# ----------------------------
+class ChatArchiveTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.event = make_event(self.user, date=timezone.now() - timedelta(days=400))
+        self.recent = make_event(self.user)
+        self.old_ids = [
+            ChatMessage.objects.create(event=self.event, sender=self.user, message=f'Old {i}').id for i in range(5)
+        ]
+        ChatMessage.objects.create(event=self.recent, sender=self.user, message='Still hot')
+        self.url = reverse('chatmessage-list-create', kwargs={'event_id': self.event.pk})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.expected = self.client.get(self.url).data['results']
+        call_command('archive_chat', '--segment-size=2', stdout=StringIO())
+
+    def get(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [m['id'] for m in response.data['results']], response.data['has_more']
+
+    def test_moves_only_old_events_into_segments(self):
+        self.assertFalse(ChatMessage.objects.filter(event=self.event).exists())
+        self.assertTrue(ChatMessage.objects.filter(event=self.recent).exists())
+        self.assertEqual(ChatArchiveSegment.objects.filter(event=self.event).count(), 3)
+
+    def test_archived_history_reads_like_hot_history(self):
+        self.assertEqual(self.client.get(self.url).data['results'], self.expected)
+        self.assertEqual(self.get(limit=2), (self.old_ids[3:], True))
+        self.assertEqual(self.get(limit=2, before=self.old_ids[3]), (self.old_ids[1:3], True))
+        self.assertEqual(self.get(limit=2, after=self.old_ids[1]), (self.old_ids[2:4], True))
+
+    def test_windows_span_archive_and_new_hot_messages(self):
+        new = ChatMessage.objects.create(event=self.event, sender=self.user, message='Reunion?').id
+        self.assertEqual(self.get(limit=3), (self.old_ids[3:] + [new], True))
+        self.assertEqual(self.get(limit=3, after=self.old_ids[3]), ([self.old_ids[4], new], False))
+        self.assertEqual(self.get(after=new), ([], False))
+        call_command('archive_chat', stdout=StringIO())
+        self.assertEqual(self.get(limit=2), ([self.old_ids[4], new], True))
+
+    def test_has_more_at_the_archive_boundary(self):
+        new = [ChatMessage.objects.create(event=self.event, sender=self.user, message=f'New {i}').id for i in range(3)]
+        # An archive read that fills the window still has hot rows after it
+        self.assertEqual(self.get(limit=4, after=self.old_ids[0]), (self.old_ids[1:], True))
+        self.assertEqual(self.get(limit=4, after=self.old_ids[4]), (new, False))
+        # Hot rows that fill the window still have archived rows before them
+        self.assertEqual(self.get(limit=3), (new, True))
+        self.assertEqual(self.get(limit=3, before=new[0]), (self.old_ids[2:], True))
+
+
+# ----------------------------
+# Notification fan-out
+# ----------------------------
+class NotificationFanoutTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.event = make_event(self.user, title='Everest Base Camp Trek')
+        self.attendees = [User.objects.create_user(f'trekker{i}', f'trekker{i}@example.com') for i in range(5)]
+        self.event.participants.add(*self.attendees[:3])
+        Booking.objects.create(user=self.attendees[2], event=self.event)
+        Booking.objects.create(user=self.attendees[3], event=self.event)
+        Booking.objects.create(user=self.attendees[4], event=self.event, status='cancelled')
+
+    def recipients(self):
+        return set(Notification.objects.values_list('user__username', flat=True))
+
+    def test_notifies_participants_and_active_bookers_once(self):
+        created = notifications.notify_event_audience(self.event, '{title} starts soon', batch_size=2)
+        self.assertEqual(created, 4)
+        self.assertEqual(self.recipients(), {'trekker0', 'trekker1', 'trekker2', 'trekker3'})
+        self.assertEqual(set(Notification.objects.values_list('message', flat=True)), {'Everest Base Camp Trek starts soon'})
+
+    def test_rescheduling_announces_the_change(self):
+        self.event.date += timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+        self.assertEqual(Notification.objects.count(), 4)
+        self.assertIn('date', Notification.objects.first().message)
+
+    def test_unannounced_edits_stay_quiet(self):
+        self.event.description = 'Now with a tea house stop'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+        self.assertEqual(Notification.objects.count(), 0)
+
+
+# ----------------------------
+# Unread notifications
+# ----------------------------
+class NotificationReadStateTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('trekker', 'trekker@example.com', 'password123')
+        other = User.objects.create_user('guest', 'guest@example.com', 'password123')
+        self.ids = [Notification.objects.create(user=self.user, message=f'Update {i}').id for i in range(5)]
+        self.foreign = Notification.objects.create(user=other, message='Not yours').id
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def unread(self):
+        return self.client.get(reverse('notification-unread-count')).data['unread']
+
+    def mark(self, payload):
+        return self.client.post(reverse('notification-mark-read'), payload, format='json')
+
+    def test_unread_count(self):
+        self.assertEqual(self.unread(), 5)
+
+    def test_mark_by_ids_ignores_other_users(self):
+        response = self.mark({'ids': [self.ids[0], self.ids[1], self.foreign]})
+        self.assertEqual(response.data, {'updated': 2, 'unread': 3})
+        self.assertFalse(Notification.objects.get(pk=self.foreign).is_read)
+
+    def test_mark_up_to_and_all_in_one_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.mark({'up_to': self.ids[2]})
+        self.assertEqual(response.data, {'updated': 3, 'unread': 2})
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 1)
+        self.assertEqual(self.mark({'all': True}).data, {'updated': 2, 'unread': 0})
+
+    def test_requires_exactly_one_selector(self):
+        self.assertEqual(self.mark({}).status_code, 400)
+        self.assertEqual(self.mark({'all': True, 'ids': [1]}).status_code, 400)
+        self.assertEqual(self.mark({'ids': 'abc'}).status_code, 400)
+
+
+# ----------------------------
+# Notification feed and retention
+# ----------------------------
+class NotificationRetentionTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('trekker', 'trekker@example.com', 'password123')
+        self.other = User.objects.create_user('guest', 'guest@example.com', 'password123')
+        now = timezone.now()
+        for i in range(6):
+            notification = Notification.objects.create(user=self.user, message=f'Update {i}')
+            Notification.objects.filter(pk=notification.pk).update(created_at=now - timedelta(days=i * 100))
+        Notification.objects.create(user=self.other, message='Welcome')
+
+    def remaining(self, user):
+        return list(user.notifications.order_by('-created_at').values_list('message', flat=True))
+
+    def test_feed_is_cursor_paginated_newest_first(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        seen, url = [], reverse('notification-list') + '?page_size=4'
+        while url:
+            data = client.get(url).data
+            seen.extend(n['message'] for n in data['results'])
+            url = data['next']
+        self.assertEqual(seen, [f'Update {i}' for i in range(6)])
+
+    def test_prune_by_age_and_per_user_limit(self):
+        out = StringIO()
+        call_command('prune_notifications', '--max-age-days=350', '--max-per-user=2', '--batch-size=1', stdout=out)
+        self.assertEqual(self.remaining(self.user), ['Update 0', 'Update 1'])
+        self.assertEqual(self.remaining(self.other), ['Welcome'])
+        self.assertIn('Deleted 2 expired and 2 over-limit', out.getvalue())
+
+
+# ----------------------------
+# Capacity-enforced booking
+# ----------------------------
+class BookingCapacityTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.event = make_event(self.organizer, max_participants=3)
+        self.users = [User.objects.create_user(f'trekker{i}', f'trekker{i}@example.com') for i in range(3)]
+
+    def book(self, user, tickets=1, event=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(
+            reverse('booking-list-create'),
+            {'event_id': (event or self.event).pk, 'ticket_count': tickets},
+            format='json',
+        )
+
+    def seats(self):
+        self.event.refresh_from_db()
+        return self.event.seats_taken
+
+    def test_rejects_bookings_past_capacity(self):
+        self.assertEqual(self.book(self.users[0], 2).status_code, 201)
+        self.assertEqual(self.book(self.users[1], 2).status_code, 409)
+        self.assertEqual(self.book(self.users[1], 1).status_code, 201)
+        self.assertEqual(self.seats(), 3)
+        self.assertEqual(Booking.objects.filter(event=self.event).count(), 2)
+
+    def test_duplicate_booking_keeps_its_seats(self):
+        self.book(self.users[0])
+        response = self.book(self.users[0])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.seats(), 1)
+
+    def test_rebooking_after_cancel_revives_the_booking(self):
+        first = self.book(self.users[0], 2).data['id']
+        self.assertTrue(bookings.cancel_booking(Booking.objects.get(pk=first)))
+        response = self.book(self.users[0], 1)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['id'], first)
+        self.assertEqual(response.data['status'], 'confirmed')
+        self.assertEqual(self.seats(), 1)
+
+    def test_unlimited_events_and_ticket_validation(self):
+        open_event = make_event(self.organizer)
+        self.assertEqual(self.book(self.users[0], 50, event=open_event).status_code, 201)
+        self.assertEqual(self.book(self.users[1], 0).status_code, 400)
+
+    def test_cancel_and_delete_release_seats(self):
+        self.book(self.users[0], 2)
+        self.book(self.users[1], 1)
+        self.assertTrue(bookings.cancel_booking(Booking.objects.get(user=self.users[0])))
+        self.assertEqual(self.seats(), 1)
+        Booking.objects.get(user=self.users[1]).delete()
+        self.assertEqual(self.seats(), 0)
+
+    def test_seats_are_counted_however_bookings_are_written(self):
+        self.book(self.users[0], 1)
+        direct = Booking.objects.create(user=self.users[1], event=self.event)
+        self.assertEqual(self.seats(), 2)
+        direct.delete()
+        self.assertEqual(self.seats(), 1)
+
+        direct = Booking.objects.create(user=self.users[1], event=self.event, ticket_count=2)
+        direct.status = 'cancelled'
+        direct.save()
+        self.assertEqual(self.seats(), 1)
+        self.book(self.users[2], 2)
+        direct.status = 'confirmed'
+        with self.assertRaises(bookings.EventFull):
+            direct.save()
+        self.assertEqual(self.seats(), 3)
+
+    def test_event_edits_do_not_overwrite_seat_count(self):
+        stale = Event.objects.get(pk=self.event.pk)
+        self.book(self.users[0], 2)
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertEqual(self.seats(), 2)
+
+
+# ----------------------------
+# Waitlist
+# ----------------------------
+class WaitlistTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.event = make_event(self.organizer, title='Everest Base Camp Trek', max_participants=2)
+        self.users = [User.objects.create_user(f'trekker{i}', f'trekker{i}@example.com') for i in range(5)]
+        self.url = reverse('event-waitlist', kwargs={'event_id': self.event.pk})
+        self.book(self.users[0], 1)
+        self.book(self.users[1], 1)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def book(self, user, tickets):
+        return self.client_for(user).post(
+            reverse('booking-list-create'), {'event_id': self.event.pk, 'ticket_count': tickets}, format='json'
+        )
+
+    def join(self, user, tickets=1):
+        return self.client_for(user).post(self.url, {'ticket_count': tickets}, format='json')
+
+    def cancel(self, user):
+        booking = Booking.objects.get(user=user, event=self.event)
+        return self.client_for(user).post(reverse('booking-cancel', kwargs={'pk': booking.pk}))
+
+    def status_of(self, user):
+        return Booking.objects.filter(user=user, event=self.event).values_list('status', flat=True).first()
+
+    def test_queue_positions(self):
+        self.assertEqual(self.join(self.users[2]).data['position'], 1)
+        self.assertEqual(self.join(self.users[3]).data['position'], 2)
+        response = self.client_for(self.users[3]).get(self.url)
+        self.assertEqual(response.data['ticket_count'], 1)
+        self.assertNotIn('position', response.data)
+        self.assertEqual(self.client_for(self.users[2]).delete(self.url).status_code, 204)
+        self.assertEqual(self.join(self.users[3]).data['position'], 1)
+
+    def test_cannot_join_with_booking_or_free_seats(self):
+        self.assertEqual(self.join(self.users[0]).status_code, 400)
+        self.event.max_participants = 10
+        self.event.save()
+        self.assertEqual(self.join(self.users[2]).status_code, 400)
+
+    def test_cancellation_promotes_in_fifo_order_and_notifies(self):
+        self.join(self.users[2], 2)
+        self.join(self.users[3], 1)
+        self.cancel(self.users[0])
+        # The head needs two seats, so the smaller party behind it must wait
+        self.assertIsNone(self.status_of(self.users[3]))
+        self.cancel(self.users[1])
+        self.assertEqual(self.status_of(self.users[2]), 'confirmed')
+        self.assertIsNone(self.status_of(self.users[3]))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 2)
+        self.assertTrue(Notification.objects.filter(user=self.users[2], message__contains='Everest').exists())
+        self.assertFalse(WaitlistEntry.objects.filter(user=self.users[2]).exists())
+
+    def test_returning_user_reuses_cancelled_booking(self):
+        self.cancel(self.users[0])
+        self.book(self.users[2], 1)
+        self.join(self.users[0])
+        self.cancel(self.users[1])
+        self.assertEqual(self.status_of(self.users[0]), 'confirmed')
+
+    def test_raising_capacity_promotes(self):
+        self.join(self.users[2])
+        self.event.max_participants = 3
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+        self.assertEqual(self.status_of(self.users[2]), 'confirmed')
+
+    def test_booking_directly_leaves_the_queue(self):
+        self.join(self.users[2])
+        Event.objects.filter(pk=self.event.pk).update(max_participants=3)
+        self.assertEqual(self.book(self.users[2], 1).status_code, 201)
+        self.assertFalse(WaitlistEntry.objects.filter(event=self.event).exists())
+
+    def test_promotion_skips_users_who_already_hold_a_booking(self):
+        self.join(self.users[2])
+        self.join(self.users[3])
+        Event.objects.filter(pk=self.event.pk).update(max_participants=3)
+        Booking.objects.create(event=self.event, user=self.users[2], ticket_count=1)
+        self.cancel(self.users[0])
+        self.assertEqual(self.status_of(self.users[3]), 'confirmed')
+        self.assertEqual(Booking.objects.get(user=self.users[2]).ticket_count, 1)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 3)
+        self.assertFalse(WaitlistEntry.objects.filter(event=self.event).exists())
+
+    def test_deleting_a_booking_promotes(self):
+        self.join(self.users[2])
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.get(user=self.users[0]).delete()
+        self.assertEqual(self.status_of(self.users[2]), 'confirmed')
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 2)
+
+    def test_cancel_only_own_active_bookings(self):
+        booking = Booking.objects.get(user=self.users[0])
+        self.assertEqual(self.client_for(self.users[1]).post(reverse('booking-cancel', kwargs={'pk': booking.pk})).status_code, 404)
+        self.cancel(self.users[0])
+        self.assertEqual(self.cancel(self.users[0]).status_code, 400)
+
+
+# ----------------------------
+# Bulk booking
+# ----------------------------
+class BulkBookingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.event = make_event(self.organizer, max_participants=4)
+        self.users = [User.objects.create_user(f'student{i}', f'student{i}@example.com') for i in range(4)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def bulk(self, items, **extra):
+        return self.client.post(reverse('booking-bulk'), {'bookings': items, **extra}, format='json')
+
+    def test_books_group_with_per_item_results(self):
+        stranger_event = make_event(self.users[3])
+        response = self.bulk([
+            {'event_id': self.event.pk, 'user_id': self.users[0].pk, 'ticket_count': 2},
+            {'event_id': self.event.pk, 'user_id': self.users[1].pk},
+            {'event_id': self.event.pk, 'user_id': self.users[1].pk},
+            {'event_id': stranger_event.pk, 'user_id': self.users[2].pk},
+            {'event_id': 0},
+            {'ticket_count': 0},
+        ])
+        self.assertEqual(response.status_code, 201)
+        codes = [result.get('code', result['status']) for result in response.data['results']]
+        self.assertEqual(codes, ['booked', 'booked', 'already_booked', 'forbidden', 'event_not_found', 'invalid'])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 3)
+        self.assertEqual(Booking.objects.filter(event=self.event).count(), 2)
+
+    def test_fills_remaining_seats_in_order(self):
+        items = [{'event_id': self.event.pk, 'user_id': user.pk, 'ticket_count': 2} for user in self.users[:3]]
+        results = self.bulk(items).data['results']
+        self.assertEqual([result['status'] for result in results], ['booked', 'booked', 'error'])
+        self.assertEqual(results[2]['code'], 'event_full')
+
+    def test_booking_removes_waitlist_entries(self):
+        WaitlistEntry.objects.create(event=self.event, user=self.users[0], ticket_count=1)
+        self.bulk([{'event_id': self.event.pk, 'user_id': self.users[0].pk}])
+        self.assertFalse(WaitlistEntry.objects.filter(event=self.event).exists())
+
+    def test_all_or_nothing_rolls_back(self):
+        items = [{'event_id': self.event.pk, 'user_id': user.pk, 'ticket_count': 2} for user in self.users[:3]]
+        response = self.bulk(items, all_or_nothing=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['booked'], 0)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 0)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_concurrent_booking_is_reported_per_item(self):
+        claim = bookings._claim_event_seats
+
+        def claim_after_race(event_id, items):
+            # Another request books users[1] after `existing` was read
+            Booking.objects.get_or_create(event_id=event_id, user=self.users[1])
+            return claim(event_id, items)
+
+        def codes(response):
+            return [result.get('code', result['status']) for result in response.data['results']]
+
+        items = [{'event_id': self.event.pk, 'user_id': user.pk} for user in self.users[:2]]
+        with mock.patch.object(bookings, '_claim_event_seats', claim_after_race):
+            self.assertEqual(codes(self.bulk(items)), ['booked', 'already_booked'])
+            self.event.refresh_from_db()
+            self.assertEqual(self.event.seats_taken, 2)
+            Booking.objects.all().delete()
+            response = self.bulk(items, all_or_nothing=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(codes(response), ['rolled_back', 'already_booked'])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, Booking.objects.count())
+
+    def test_revives_cancelled_booking(self):
+        booking = Booking.objects.create(event=self.event, user=self.users[0], status='cancelled')
+        results = self.bulk([{'event_id': self.event.pk, 'user_id': self.users[0].pk}]).data['results']
+        self.assertEqual(results[0]['booking_id'], booking.pk)
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'confirmed')
+
+
+# ----------------------------
+# Review aggregates
+# ----------------------------
+class RatingAggregateTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.users = [User.objects.create_user(f'reviewer{i}', f'reviewer{i}@example.com') for i in range(3)]
+        self.event = make_event(self.organizer)
+
+    def review(self, user, rating, event=None):
+        return Review.objects.create(user=user, event=event or self.event, rating=rating, comment='Lovely views')
+
+    def aggregates(self, event=None):
+        event = Event.objects.get(pk=(event or self.event).pk)
+        return event.rating_avg, event.rating_count, event.rating_histogram
+
+    def test_create_update_delete_keep_aggregates(self):
+        first = self.review(self.users[0], 5)
+        self.review(self.users[1], 2)
+        self.assertEqual(self.aggregates(), (3.5, 2, {'1': 0, '2': 1, '3': 0, '4': 0, '5': 1}))
+        first.rating = 4
+        first.save()
+        self.assertEqual(self.aggregates()[:2], (3.0, 2))
+        other = make_event(self.organizer)
+        first.event = other
+        first.save()
+        self.assertEqual(self.aggregates()[:2], (2.0, 1))
+        self.assertEqual(self.aggregates(other)[:2], (4.0, 1))
+        first.delete()
+        self.assertEqual(self.aggregates(other), (0.0, 0, {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0}))
+
+    def test_event_edits_keep_aggregates(self):
+        stale = Event.objects.get(pk=self.event.pk)
+        self.review(self.users[0], 4)
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertEqual(self.aggregates()[:2], (4.0, 1))
+
+    def test_feed_orders_by_rating_with_cursor(self):
+        low, high = make_event(self.organizer), make_event(self.organizer)
+        self.review(self.users[0], 2, low)
+        self.review(self.users[0], 5, high)
+        response = self.client.get(reverse('event-list-create'), {'ordering': '-rating', 'page_size': 1})
+        self.assertEqual([event['id'] for event in response.data['results']], [high.pk])
+        self.assertEqual(response.data['results'][0]['rating_histogram']['5'], 1)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([event['id'] for event in response.data['results']], [low.pk])
+        self.assertEqual(self.client.get(reverse('event-list-create'), {'ordering': 'title'}).status_code, 400)
+
+    def test_cursor_is_tied_to_its_ordering(self):
+        make_event(self.organizer)
+        next_link = self.client.get(reverse('event-list-create'), {'page_size': 1}).data['next']
+        self.assertEqual(self.client.get(next_link).status_code, 200)
+        self.assertEqual(self.client.get(next_link + '&ordering=-rating').status_code, 404)
+
+    def test_review_listing_is_paginated_and_validated(self):
+        for user in self.users:
+            self.review(user, 3)
+        url = reverse('event-reviews', kwargs={'event_id': self.event.pk})
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 1)
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        response = client.post(url, {'event': self.event.pk, 'rating': 6, 'comment': 'Too good'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+# ----------------------------
+# Per-user membership flags
+# ----------------------------
+class MembershipFlagTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+        self.user = User.objects.create_user('trekker', 'trekker@example.com', 'password123')
+        self.liked = make_event(self.organizer, title='Everest Base Camp Trek')
+        self.booked = make_event(self.organizer, title='Pokhara Street Festival')
+        Favorite.objects.create(user=self.user, event=self.liked)
+        Booking.objects.create(user=self.user, event=self.booked)
+        self.client = APIClient()
+
+    def flags(self, user):
+        self.client.force_authenticate(user)
+        results = self.client.get(reverse('event-list-create')).data['results']
+        return {event['id']: (event['is_favorited'], event['is_booked']) for event in results}
+
+    def test_feed_flags_are_per_user_despite_shared_cache(self):
+        self.assertEqual(self.flags(self.user), {self.liked.pk: (True, False), self.booked.pk: (False, True)})
+        self.assertEqual(self.flags(self.organizer), {self.liked.pk: (False, False), self.booked.pk: (False, False)})
+        Booking.objects.filter(user=self.user).update(status='cancelled')
+        self.assertFalse(self.flags(self.user)[self.booked.pk][1])
+        self.client.force_authenticate(None)
+        self.assertNotIn('is_favorited', self.client.get(reverse('event-list-create')).data['results'][0])
+
+    def test_favorite_ids_revalidate_with_etag(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('favorite-ids')
+        response = self.client.get(url)
+        self.assertEqual(response.data, {'event_ids': [self.liked.pk]})
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        Favorite.objects.create(user=self.user, event=self.booked)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.data, {'event_ids': [self.liked.pk, self.booked.pk]})
+
+
+# ----------------------------
+# Token authentication cache
+# ----------------------------
+class TokenAuthCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('trekker', 'trekker@example.com', 'password123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('notification-unread-count')
+
+    def test_repeat_requests_skip_the_token_query(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if 'authtoken_token' in q['sql']])
+        stats = authentication.get_token_cache().stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+    def test_logout_and_deactivation_invalidate(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.post(reverse('logout')).status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_revocation_reaches_other_processes(self):
+        other_worker = authentication.TokenUserCache(shared=cache)
+        other_worker.set(self.token.key, self.user, self.token)
+        self.assertIsNotNone(other_worker.get(self.token.key))
+        self.assertEqual(self.client.post(reverse('logout')).status_code, 200)
+        self.assertIsNone(other_worker.get(self.token.key))
+
+        token = Token.objects.create(user=self.user)
+        other_worker.set(token.key, self.user, token)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertIsNone(other_worker.get(token.key))
+        self.assertEqual(other_worker.stats()['misses'], 2)
+
+    def test_cache_is_bounded_and_expires(self):
+        token_cache = authentication.TokenUserCache(max_size=1, ttl=60)
+        other = User.objects.create_user('guide', 'guide@example.com')
+        token_cache.set('a', self.user, self.token)
+        token_cache.set('b', other, self.token)
+        self.assertIsNone(token_cache.get('a'))
+        self.assertEqual(token_cache.get('b')[0], other)
+        self.assertIsNot(token_cache.get('b')[0], other)
+        self.assertEqual(token_cache.stats()['evictions'], 1)
+        token_cache.ttl = 0
+        token_cache.set('b', other, self.token)
+        self.assertIsNone(token_cache.get('b'))
+
+    def test_stats_are_admin_only(self):
+        self.assertEqual(self.client.get(reverse('token-cache-stats')).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertIn('hit_rate', self.client.get(reverse('token-cache-stats')).data)
+
+
+# ----------------------------
+# Login
+# ----------------------------
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000, LOGIN_HASH_WAIT=0.1)
+class LoginTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('trekker', 'Trekker@Example.com', 'password123')
+        self.client = APIClient()
+
+    def login(self, email='trekker@example.com', password='password123'):
+        return self.client.post(reverse('login'), {'email': email, 'password': password}, format='json')
+
+    def test_case_insensitive_login_in_one_lookup(self):
+        self.login()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.login(' TREKKER@example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['token'], Token.objects.get(user=self.user).key)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+
+    def test_rejects_wrong_password_unknown_email_and_inactive_users(self):
+        self.assertEqual(self.login(password='nope').status_code, 401)
+        self.assertEqual(self.login('nobody@example.com').status_code, 401)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.login().status_code, 401)
+
+    def test_rehashes_to_current_policy_on_login(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_saturated_hash_pool_answers_503(self):
+        _, slots = login._get_pool()
+        taken = 0
+        while slots.acquire(blocking=False):
+            taken += 1
+        try:
+            response = self.login()
+        finally:
+            for _ in range(taken):
+                slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_signup_rejects_email_in_other_case(self):
+        response = self.client.post(reverse('signup'), {
+            'username': 'another', 'email': 'TREKKER@example.com', 'password': 'password123',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+# ----------------------------
+# Auth endpoint throttling
+# ----------------------------
+@override_settings(
+    PASSWORD_PBKDF2_ITERATIONS=1000,
+    AUTH_THROTTLE_RATES={'login': {'ip': '5/min', 'identity': '2/min'}, 'signup': {'identity': '1/h'}},
+)
+class AuthThrottleTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        User.objects.create_user('trekker', 'trekker@example.com', 'password123')
+        self.client = APIClient()
+
+    def login(self, email, password='wrong'):
+        return self.client.post(reverse('login'), {'email': email, 'password': password}, format='json')
+
+    def test_identity_limit_rejects_before_any_query(self):
+        self.assertEqual(self.login('trekker@example.com').status_code, 401)
+        self.assertEqual(self.login('TREKKER@example.com').status_code, 401)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.login('trekker@example.com', 'password123')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        # Other accounts are only bound by the per-IP limit
+        self.assertEqual(self.login('guide@example.com').status_code, 401)
+
+    def test_ip_limit_and_per_endpoint_rates(self):
+        for i in range(5):
+            self.login(f'user{i}@example.com')
+        self.assertEqual(self.login('fresh@example.com').status_code, 429)
+        signup = {'username': 'newbie', 'email': 'newbie@example.com', 'password': 'password123'}
+        self.assertEqual(self.client.post(reverse('signup'), signup, format='json').status_code, 201)
+        self.assertEqual(self.client.post(reverse('signup'), signup, format='json').status_code, 429)
+
+    def test_ip_limit_ignores_client_supplied_forwarded_for(self):
+        for i in range(5):
+            self.client.post(
+                reverse('login'), {'email': f'user{i}@example.com', 'password': 'wrong'},
+                format='json', HTTP_X_FORWARDED_FOR=f'203.0.113.{i}',
+            )
+        response = self.client.post(
+            reverse('login'), {'email': 'fresh@example.com', 'password': 'wrong'},
+            format='json', HTTP_X_FORWARDED_FOR='203.0.113.99',
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_counters_survive_response_cache_eviction(self):
+        for i in range(5):
+            self.login(f'user{i}@example.com')
+        cache.clear()
+        self.assertEqual(self.login('fresh@example.com').status_code, 429)
+
+    def test_concurrent_records_are_all_counted(self):
+        now = 1000 * 60
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: throttling.record('burst', 60, now), range(200)))
+        self.assertEqual(throttling.counters().get('throttle:burst:1000'), 200)
+
+    def test_window_slides(self):
+        now = 1000 * 60 + 30  # halfway through a one-minute window
+        for _ in range(4):
+            throttling.record('probe', 60, now - 60)
+        # Half of the previous window still counts: 4 * 0.5 = 2, under the limit of 3
+        self.assertEqual(throttling.retry_after('probe', 3, 60, now), 0)
+        throttling.record('probe', 60, now)
+        throttling.record('probe', 60, now)
+        # 4 * (60 - t) / 60 + 2 < 3 once t passes 45s into the window
+        self.assertEqual(throttling.retry_after('probe', 3, 60, now), 15)
+        self.assertEqual(throttling.retry_after('probe', 3, 60, now + 16), 0)
+
+
+# ----------------------------
+# Bulk user import
+# ----------------------------
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class ImportUsersTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        User.objects.create_user('existing', 'Taken@example.com')
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def run_import(self, name, content, *args):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(content)
+        out, err = StringIO(), StringIO()
+        call_command('import_users', path, '--workers', '1', '--batch-size', '2', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_skips_duplicates_and_keeps_going(self):
+        out, err = self.run_import('agency.csv', (
+            'username,email,password,first_name,phone\n'
+            'sherpa1,Sherpa1@Example.com,climb-high-1,Pemba,9800000001\n'
+            'sherpa2,sherpa2@example.com,climb-high-2,Lakpa,\n'
+            'sherpa3,SHERPA1@example.com,climb-high-3,Dawa,\n'
+            'existing,new@example.com,climb-high-4,,\n'
+            'sherpa4,taken@example.com,climb-high-5,,\n'
+            'sherpa5,sherpa5@example.com,,Mingma,\n'
+        ))
+        self.assertIn('Imported 3 users, skipped 3.', out)
+        self.assertIn("line 4: duplicate email 'sherpa1@example.com'", err)
+        self.assertIn("line 5: duplicate username 'existing'", err)
+        imported = User.objects.get(username='sherpa1')
+        self.assertEqual(imported.email, 'sherpa1@example.com')
+        self.assertTrue(imported.check_password('climb-high-1'))
+        self.assertEqual(imported.profile.phone, '9800000001')
+        self.assertTrue(Token.objects.filter(user=imported).exists())
+        self.assertFalse(User.objects.get(username='sherpa5').has_usable_password())
+
+    def test_ndjson_with_prehashed_passwords_and_bad_lines(self):
+        encoded = make_password('secret-pass')
+        out, err = self.run_import('agency.ndjson', '\n'.join([
+            json.dumps({'username': 'guide1', 'email': 'guide1@example.com', 'password_hash': encoded}),
+            '{not json',
+            json.dumps({'username': 'bad name!', 'email': 'guide2@example.com'}),
+            json.dumps({'username': 'guide3'}),
+        ]))
+        self.assertIn('Imported 1 users, skipped 3.', out)
+        self.assertIn('line 2: invalid JSON', err)
+        self.assertEqual(User.objects.get(username='guide1').password, encoded)
+
+
+# ----------------------------
+# Image variants
+# ----------------------------
+def make_image(name='peak.png', size=(2000, 1000), mode='RGBA'):
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 80, 40, 128)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ImageVariantTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user('organizer', 'organizer@example.com', 'password123')
+
+    def make_event_with_image(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            event = make_event(self.user, image=image)
+        event.refresh_from_db()
+        return event
+
+    def test_upload_generates_variants_exposed_on_cards(self):
+        event = self.make_event_with_image(make_image())
+        storage = event.image.storage
+        from PIL import Image
+        for variant, longest_side in images.VARIANTS.items():
+            for name in event.image_variants[variant].values():
+                with storage.open(name) as handle:
+                    self.assertEqual(max(Image.open(handle).size), longest_side)
+        card = self.client.get(reverse('event-list-create'), {'view': 'card'}).data['results'][0]
+        self.assertTrue(card['image_variants']['thumb']['webp'].endswith('.thumb.webp'))
+        self.assertTrue(card['image_variants']['card']['jpeg'].startswith('http://testserver/media/'))
+
+    def test_replace_and_delete_clean_up_variant_files(self):
+        event = self.make_event_with_image(make_image('first.png'))
+        storage = event.image.storage
+        first = event.image_variants['thumb']['webp']
+        event.image = make_image('second.png', size=(100, 50), mode='RGB')
+        with self.captureOnCommitCallbacks(execute=True):
+            event.save()
+        event.refresh_from_db()
+        self.assertFalse(storage.exists(first))
+        second = event.image_variants['full']['jpeg']
+        self.assertTrue(storage.exists(second))
+        with self.captureOnCommitCallbacks(execute=True):
+            event.delete()
+        self.assertFalse(storage.exists(second))
+
+    def test_sources_differing_only_in_extension_keep_separate_variants(self):
+        jpg = self.make_event_with_image(make_image('photo.jpg', mode='RGB'))
+        png = self.make_event_with_image(make_image('photo.png'))
+        self.assertTrue(jpg.image_variants['card']['webp'].endswith('photo.jpg.card.webp'))
+        self.assertNotEqual(jpg.image_variants['card']['webp'], png.image_variants['card']['webp'])
+        with self.captureOnCommitCallbacks(execute=True):
+            png.delete()
+        storage = jpg.image.storage
+        self.assertTrue(all(storage.exists(name) for name in jpg.image_variants['card'].values()))
+
+    def test_unreadable_upload_and_backfill(self):
+        event = self.make_event_with_image(SimpleUploadedFile('broken.png', b'not an image'))
+        self.assertEqual(event.image_variants, {'source': event.image.name})
+        response = self.client.get(reverse('event-detail', kwargs={'pk': event.pk}))
+        self.assertIsNone(response.data['image_variants'])
+
+        avatar = Profile.objects.create(user=self.user, avatar=make_image('me.png'))
+        out = StringIO()
+        call_command('generate_image_variants', stdout=out)
+        avatar.refresh_from_db()
+        self.assertIn('thumb', avatar.avatar_variants)
+        self.assertIn('profiles: 1 of 1 updated', out.getvalue())
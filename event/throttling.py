@@ -0,0 +1,108 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+# ----------------------------
+# Sliding-window rate limits
+# ----------------------------
+# Each key keeps two counters in the cache, for the current and the previous
+# fixed window. The previous window's count is weighted by how much of it
+# still overlaps the sliding window, which approximates a true sliding log in
+# O(1) time and memory per key. Rates look like "5/min" (s, min, h, day).
+# Counters live in the dedicated 'throttle' cache (see CACHES in settings),
+# whose incr is atomic and which no response caching can crowd out.
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+CACHE_ALIAS = 'throttle'
+
+
+def counters():
+    return caches[CACHE_ALIAS]
+
+
+def parse_rate(rate):
+    count, period = rate.split('/')
+    return int(count), PERIODS[period.strip()[0]]
+
+
+def _window_keys(key, period, now):
+    window = int(now // period)
+    return f'throttle:{key}:{window}', f'throttle:{key}:{window - 1}', now - window * period
+
+
+def retry_after(key, limit, period, now=None):
+    """Seconds until `key` may make another attempt; 0 when it may now."""
+    now = time.time() if now is None else now
+    current_key, previous_key, elapsed = _window_keys(key, period, now)
+    counts = counters().get_many([current_key, previous_key])
+    current, previous = counts.get(current_key, 0), counts.get(previous_key, 0)
+    if previous * (period - elapsed) / period + current < limit:
+        return 0
+    if current < limit:
+        # The previous window's weight has to fade until the estimate fits
+        free_at = period - (limit - current) * period / previous
+        return max(1, math.ceil(free_at - elapsed))
+    # Wait for the next window, then for this window's weight to fade
+    return max(1, math.ceil(period - elapsed + period * (1 - limit / current)))
+
+
+def record(key, period, now=None):
+    now = time.time() if now is None else now
+    current_key, _, _ = _window_keys(key, period, now)
+    store = counters()
+    store.add(current_key, 0, timeout=2 * period)
+    try:
+        store.incr(current_key)
+    except ValueError:
+        store.set(current_key, 1, timeout=2 * period)
+
+
+class AuthEndpointThrottle(BaseThrottle):
+    """
+    Limits attempts per client IP and per submitted identity (email or
+    username) using AUTH_THROTTLE_RATES[scope], e.g.
+    {'ip': '20/min', 'identity': '5/min'}. Runs before the view, so an
+    over-limit attempt costs no password hash and no query. The client IP
+    honours X-Forwarded-For only up to REST_FRAMEWORK['NUM_PROXIES'].
+    """
+    scope = None
+    identity_fields = ('email',)
+
+    def get_checks(self, request):
+        rates = getattr(settings, 'AUTH_THROTTLE_RATES', {}).get(self.scope, {})
+        checks = []
+        if rates.get('ip'):
+            checks.append((f'{self.scope}:ip:{self.get_ident(request)}', *parse_rate(rates['ip'])))
+        if rates.get('identity'):
+            for field in self.identity_fields:
+                value = request.data.get(field)
+                if isinstance(value, str) and value.strip():
+                    digest = hashlib.sha256(value.strip().lower().encode('utf-8')).hexdigest()
+                    checks.append((f'{self.scope}:{field}:{digest}', *parse_rate(rates['identity'])))
+        return checks
+
+    def allow_request(self, request, view):
+        now = time.time()
+        checks = self.get_checks(request)
+        self.wait_seconds = max((retry_after(key, limit, period, now) for key, limit, period in checks), default=0)
+        if self.wait_seconds:
+            return False
+        for key, _, period in checks:
+            record(key, period, now)
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class LoginThrottle(AuthEndpointThrottle):
+    scope = 'login'
+
+
+class SignupThrottle(AuthEndpointThrottle):
+    scope = 'signup'
+    identity_fields = ('email', 'username')
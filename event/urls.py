@@ -5,20 +5,29 @@ urlpatterns = [
     # Authentication endpoints
     path('auth/login/', views.login_view, name='login'),
     path('auth/logout/', views.logout_view, name='logout'),
+    path('auth/token-cache/', views.token_cache_stats_view, name='token-cache-stats'),
     path('auth/signup/', views.signup_view, name='signup'),
 
     # Event endpoints
     path('events/', views.EventListCreateView.as_view(), name='event-list-create'),
+    path('events/map/', views.EventMapView.as_view(), name='event-map'),
+    path('events/search/', views.EventSearchView.as_view(), name='event-search'),
     path('events/<int:pk>/', views.EventDetailView.as_view(), name='event-detail'),
 
+    # Tag endpoints
+    path('tags/', views.TagListView.as_view(), name='tag-list'),
+
     # Notification endpoints
     path('notifications/', views.NotificationListView.as_view(), name='notification-list'),
+    path('notifications/unread-count/', views.unread_notification_count_view, name='notification-unread-count'),
+    path('notifications/mark-read/', views.mark_notifications_read_view, name='notification-mark-read'),
 
     # Chat endpoints (event-based chat)
     path('events/<int:event_id>/chat/', views.ChatMessageListCreateView.as_view(), name='chatmessage-list-create'),
 
     # Favorite endpoints
     path('favorites/', views.FavoriteListCreateView.as_view(), name='favorite-list-create'),
+    path('favorites/ids/', views.FavoriteIdsView.as_view(), name='favorite-ids'),
     path('favorites/<int:event_id>/', views.FavoriteDetailView.as_view(), name='favorite-detail'),
 
     # Profile endpoints
@@ -26,6 +35,9 @@ urlpatterns = [
 
     # Booking endpoints
     path('bookings/', views.BookingListCreateView.as_view(), name='booking-list-create'),
+    path('bookings/bulk/', views.bulk_booking_view, name='booking-bulk'),
+    path('bookings/<int:pk>/cancel/', views.cancel_booking_view, name='booking-cancel'),
+    path('events/<int:event_id>/waitlist/', views.WaitlistView.as_view(), name='event-waitlist'),
 
     # Review endpoints
     path('reviews/', views.ReviewListCreateView.as_view(), name='review-list'),
@@ -0,0 +1,190 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from rest_framework.authtoken.models import Token
+
+from .login import normalize_email
+from .models import Profile
+
+# ----------------------------
+# Bulk user import
+# ----------------------------
+# `manage.py import_users` streams CSV or NDJSON rows in batches, so memory
+# stays flat however long the file is. Per batch: one query each finds the
+# usernames and emails that already exist, passwords are hashed on a process
+# pool, and User, Token and Profile rows go in with three bulk_creates.
+# Duplicates and bad rows are reported and skipped; the import carries on.
+#
+# Columns: username, email, password or password_hash (an already-encoded
+# Django hash), first_name, last_name, and the Profile fields listed below.
+# Rows without a password get an unusable one.
+
+BATCH_SIZE = 1000
+PROFILE_FIELDS = ('full_name', 'phone', 'location', 'bio', 'hobbies')
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    skipped: int = 0
+    on_skip: Callable[[int, str], None] = None  # receives (line number, reason) as they happen
+
+    def skip(self, line, reason):
+        self.skipped += 1
+        if self.on_skip:
+            self.on_skip(line, reason)
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, dict) from a CSV or NDJSON text stream; bad lines yield an error string."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            yield line, 'invalid JSON'
+            continue
+        yield line, row if isinstance(row, dict) else 'expected a JSON object'
+
+
+def _init_worker():
+    # Spawned (not forked) workers start without Django configured
+    import django
+    from django.conf import settings
+    if not settings.configured or not django.apps.apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+        django.setup()
+
+
+def _hash(password):
+    return make_password(password)
+
+
+def _clean(line, row, report):
+    if isinstance(row, str):
+        report.skip(line, row)
+        return None
+    username = str(row.get('username') or '').strip()
+    email = normalize_email(str(row.get('email') or ''))
+    if not username or not email:
+        report.skip(line, 'username and email are required')
+        return None
+    try:
+        User.username_validator(username)
+    except ValidationError:
+        report.skip(line, f'invalid username {username!r}')
+        return None
+    values = {
+        'username': username,
+        'email': email,
+        'first_name': str(row.get('first_name') or '').strip(),
+        'last_name': str(row.get('last_name') or '').strip(),
+    }
+    profile = {name: str(row.get(name) or '').strip() for name in PROFILE_FIELDS}
+    for model, fields in ((User, values), (Profile, profile)):
+        for name, value in fields.items():
+            max_length = model._meta.get_field(name).max_length
+            if max_length and len(value) > max_length:
+                report.skip(line, f'{name} longer than {max_length} characters')
+                return None
+    password_hash = row.get('password_hash')
+    if password_hash:
+        try:
+            identify_hasher(password_hash)
+        except ValueError:
+            report.skip(line, 'unrecognized password_hash')
+            return None
+    return {
+        'line': line,
+        **values,
+        'password': row.get('password') or None,
+        'password_hash': password_hash or None,
+        'profile': profile,
+    }
+
+
+def _drop_duplicates(rows, report):
+    usernames = {row['username'] for row in rows}
+    emails = {row['email'] for row in rows}
+    taken_usernames = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    taken_emails = set(
+        User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails)
+        .values_list('email_lower', flat=True)
+    )
+    unique = []
+    for row in rows:
+        if row['username'] in taken_usernames:
+            report.skip(row['line'], f"duplicate username {row['username']!r}")
+        elif row['email'] in taken_emails:
+            report.skip(row['line'], f"duplicate email {row['email']!r}")
+        else:
+            # Later rows with the same username or email are duplicates of this one
+            taken_usernames.add(row['username'])
+            taken_emails.add(row['email'])
+            unique.append(row)
+    return unique
+
+
+def _insert(rows):
+    users = User.objects.bulk_create([
+        User(
+            username=row['username'], email=row['email'], password=row['encoded'],
+            first_name=row['first_name'], last_name=row['last_name'],
+        )
+        for row in rows
+    ])
+    Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users])
+    Profile.objects.bulk_create([Profile(user=user, **row['profile']) for user, row in zip(users, rows)])
+
+
+def _write_batch(rows, pool, report):
+    rows = _drop_duplicates(rows, report)
+    plain = [row for row in rows if not row['password_hash'] and row['password']]
+    for row, encoded in zip(plain, pool.map(_hash, [row['password'] for row in plain], chunksize=16)):
+        row['encoded'] = encoded
+    for row in rows:
+        row.setdefault('encoded', row['password_hash'] or make_password(None))
+    try:
+        with transaction.atomic():
+            _insert(rows)
+        report.created += len(rows)
+    except IntegrityError:
+        # Someone signed up mid-import; fall back to row by row for this batch
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    _insert([row])
+                report.created += 1
+            except IntegrityError:
+                report.skip(row['line'], 'duplicate username or email')
+
+
+def import_users(stream, fmt='csv', batch_size=BATCH_SIZE, workers=None, on_skip=None):
+    report = ImportReport(on_skip=on_skip)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        batch = []
+        for line, row in read_rows(stream, fmt):
+            cleaned = _clean(line, row, report)
+            if cleaned:
+                batch.append(cleaned)
+            if len(batch) >= batch_size:
+                _write_batch(batch, pool, report)
+                batch = []
+        if batch:
+            _write_batch(batch, pool, report)
+    return report
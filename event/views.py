@@ -1,19 +1,28 @@
 from rest_framework import generics, permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
-from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from .models import Event, Notification, ChatMessage, Favorite, Profile, Booking, Review
+from django.db.models import Count, Max, Prefetch
+from django.utils import timezone
+from .models import Event, EventImage, Notification, ChatMessage, Favorite, Profile, Booking, Review, Tag, WaitlistEntry
+from . import archive, authentication, bookings, geo, login, membership, search
+from .cache import ConditionalGetMixin, VersionedCacheMixin, event_version_key, favorites_version_key, get_versions
+from .filters import EventFacetFilter, EventProximityFilter, EventTagFilter, parse_bbox
+from .pagination import ChatHistoryPagination, EventCursorPagination, NotificationCursorPagination, ReviewCursorPagination
 from .serializers import (
 	ProfileSerializer, EventSerializer, NotificationSerializer,
 	ChatMessageSerializer, FavoriteSerializer, UserSerializer,
-	BookingSerializer, ReviewSerializer
+	BookingSerializer, BulkBookingItemSerializer, BulkBookingSerializer, ReviewSerializer, TagSerializer, WaitlistEntrySerializer
 )
+from .throttling import LoginThrottle, SignupThrottle
 
 # Authentication Views
 @api_view(['POST'])
+@authentication_classes([])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([LoginThrottle])
 def login_view(request):
 	"""
 	Login endpoint that accepts email and password
@@ -28,38 +37,32 @@ def login_view(request):
 			status=status.HTTP_400_BAD_REQUEST
 		)
 	
-	# Try to get user by email
-	try:
-		user = User.objects.get(email=email)
-	except User.DoesNotExist:
-		return Response(
-			{'message': 'Invalid email or password'},
-			status=status.HTTP_401_UNAUTHORIZED
-		)
-	
-	# Authenticate with username and password
-	authenticated_user = authenticate(username=user.username, password=password)
+	# Case-insensitive, indexed lookup that also joins the token and profile
+	user = login.find_user_by_email(email)
 	
-	if authenticated_user is None:
+	# Verify on the bounded hash pool; unknown emails cost the same time
+	if not login.verify_password(user, password):
 		return Response(
 			{'message': 'Invalid email or password'},
 			status=status.HTTP_401_UNAUTHORIZED
 		)
 	
-	# Get or create token
-	token, created = Token.objects.get_or_create(user=authenticated_user)
-	
-	# Get or create profile
-	profile, _ = Profile.objects.get_or_create(user=authenticated_user)
+	# Reuse the joined token and profile, creating them only when missing
+	try:
+		token = user.auth_token
+	except Token.DoesNotExist:
+		token, _ = Token.objects.get_or_create(user=user)
+	if not hasattr(user, 'profile'):
+		Profile.objects.get_or_create(user=user)
 	
 	return Response({
 		'token': token.key,
 		'user': {
-			'id': authenticated_user.id,
-			'username': authenticated_user.username,
-			'email': authenticated_user.email,
-			'first_name': authenticated_user.first_name,
-			'last_name': authenticated_user.last_name,
+			'id': user.id,
+			'username': user.username,
+			'email': user.email,
+			'first_name': user.first_name,
+			'last_name': user.last_name,
 		}
 	}, status=status.HTTP_200_OK)
 
@@ -75,8 +78,16 @@ def logout_view(request):
 	except Exception as e:
 		return Response({'message': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def token_cache_stats_view(request):
+	"""Hit-rate metrics of this worker process's token authentication cache."""
+	return Response(authentication.get_token_cache().stats())
+
 @api_view(['POST'])
+@authentication_classes([])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([SignupThrottle])
 def signup_view(request):
 	"""
 	Signup endpoint that creates a new user
@@ -101,8 +112,9 @@ def signup_view(request):
 			status=status.HTTP_400_BAD_REQUEST
 		)
 	
-	# Check if email already exists
-	if User.objects.filter(email=email).exists():
+	# Check if email already exists, in any letter case
+	email = login.normalize_email(email)
+	if login.email_taken(email):
 		return Response(
 			{'message': 'Email already exists'},
 			status=status.HTTP_400_BAD_REQUEST
@@ -155,11 +167,36 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
 		return owner == request.user
 
 # Event Views
-class EventListCreateView(generics.ListCreateAPIView):
-	queryset = Event.objects.all().order_by('-date')
+class EventListCreateView(VersionedCacheMixin, generics.ListCreateAPIView):
 	serializer_class = EventSerializer
+	pagination_class = EventCursorPagination
+	filter_backends = [EventProximityFilter, EventTagFilter, EventFacetFilter]
 	permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+	def get_queryset(self):
+		fields = EventSerializer.requested_fields(self.request)
+		return Event.objects.with_related(fields).order_by('-date', '-id')
+
+	def list(self, request, *args, **kwargs):
+		response = super().list(request, *args, **kwargs)
+		# Facet counts are only needed to draw the filter UI, i.e. on the first page
+		if not self.paginator.has_cursor:
+			queryset = self.get_queryset()
+			for backend in self.filter_backends:
+				if backend is not EventFacetFilter:
+					queryset = backend().filter_queryset(request, queryset, self)
+			response.data['facets'] = EventFacetFilter().facet_counts(request, queryset)
+		return response
+
+	def personalize_response(self, request, response):
+		# The viewer's hearts and tickets, never part of the shared cached page
+		if not request.user.is_authenticated:
+			return
+		results = response.data['results']
+		flags = membership.event_flags(request.user, [event['id'] for event in results])
+		for event in results:
+			event.update(flags[event['id']])
+
 	def perform_create(self, serializer):
 		event = serializer.save(created_by=self.request.user)
 		# Handle gallery images
@@ -167,27 +204,174 @@ class EventListCreateView(generics.ListCreateAPIView):
 		for image in images:
 			EventImage.objects.create(event=event, image=image)
 
-class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
-	queryset = Event.objects.all()
+class EventSearchView(generics.ListAPIView):
+	"""
+	Ranked full-text search over events: /api/events/search/?q=everest+trek
+	Returns up to `limit` (max 50) events, best match first.
+	"""
+	serializer_class = EventSerializer
+	permission_classes = [permissions.AllowAny]
+	default_limit = 20
+	max_limit = 50
+
+	def get_limit(self):
+		try:
+			limit = int(self.request.query_params.get('limit', self.default_limit))
+		except ValueError:
+			return self.default_limit
+		return max(1, min(limit, self.max_limit))
+
+	def get_queryset(self):
+		ids = search.search_event_ids(self.request.query_params.get('q', ''), self.get_limit())
+		fields = EventSerializer.requested_fields(self.request)
+		events = Event.objects.with_related(fields).in_bulk(ids)
+		return [events[pk] for pk in ids if pk in events]
+
+class EventMapView(APIView):
+	"""
+	Clustered map markers: /api/events/map/?bbox=min_lon,min_lat,max_lon,max_lat
+	Each cluster carries its centre and size; single-event clusters include the event id.
+	"""
+	permission_classes = [permissions.AllowAny]
+
+	def get(self, request):
+		bbox = request.query_params.get('bbox')
+		if not bbox:
+			return Response({'message': 'bbox is required'}, status=status.HTTP_400_BAD_REQUEST)
+		clusters = geo.cluster(Event.objects.all(), *parse_bbox(bbox))
+		return Response({'clusters': clusters})
+
+class EventDetailView(ConditionalGetMixin, VersionedCacheMixin, generics.RetrieveUpdateDestroyAPIView):
 	serializer_class = EventSerializer
 	permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
 
+	def get_cache_version_keys(self):
+		return [event_version_key(self.kwargs['pk'])]
+
+	def get_validators(self, request):
+		updated_at = Event.objects.filter(pk=self.kwargs['pk']).values_list('updated_at', flat=True).first()
+		if updated_at is None:
+			return None, None
+		version, = get_versions(self.get_cache_version_keys())
+		return version, updated_at
+
+	def get_queryset(self):
+		return Event.objects.with_related(EventSerializer.requested_fields(self.request))
+
+# Tag Views
+class TagListView(generics.ListAPIView):
+	"""
+	Tag cloud: the most used tags with their event counts, read from the
+	maintained Tag.event_count index. ?limit= caps the list (max 200).
+	"""
+	serializer_class = TagSerializer
+	permission_classes = [permissions.AllowAny]
+	default_limit = 50
+	max_limit = 200
+
+	def get_queryset(self):
+		try:
+			limit = int(self.request.query_params.get('limit', self.default_limit))
+		except ValueError:
+			limit = self.default_limit
+		limit = max(1, min(limit, self.max_limit))
+		return Tag.objects.filter(event_count__gt=0).order_by('-event_count', 'slug')[:limit]
+
 # Notification Views
-class NotificationListView(generics.ListAPIView):
+class NotificationListView(ConditionalGetMixin, generics.ListAPIView):
 	serializer_class = NotificationSerializer
+	pagination_class = NotificationCursorPagination
 	permission_classes = [permissions.IsAuthenticated]
 
+	def get_validators(self, request):
+		state = Notification.objects.filter(user=request.user).aggregate(
+			total=Count('id'), last_id=Max('id'), last_modified=Max('updated_at'),
+		)
+		return f"{state['total']}:{state['last_id']}:{state['last_modified']}", state['last_modified']
+
 	def get_queryset(self):
-		return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+		return Notification.objects.filter(user=self.request.user).select_related('user').order_by('-created_at', '-id')
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def unread_notification_count_view(request):
+	"""
+	Number of unread notifications for the navbar badge,
+	counted on the partial unread index
+	"""
+	count = Notification.objects.filter(user=request.user, is_read=False).count()
+	return Response({'unread': count}, status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def mark_notifications_read_view(request):
+	"""
+	Mark notifications read in a single UPDATE. Accepts exactly one of:
+	{"all": true}, {"up_to": <id>} (that id and everything older) or {"ids": [...]}
+	"""
+	selectors = [key for key in ('all', 'up_to', 'ids') if key in request.data]
+	if len(selectors) != 1:
+		return Response(
+			{'message': 'Provide exactly one of all, up_to or ids'},
+			status=status.HTTP_400_BAD_REQUEST
+		)
+
+	notifications = Notification.objects.filter(user=request.user, is_read=False)
+	try:
+		if selectors == ['up_to']:
+			notifications = notifications.filter(id__lte=int(request.data['up_to']))
+		elif selectors == ['ids']:
+			raw_ids = request.data.getlist('ids') if hasattr(request.data, 'getlist') else request.data['ids']
+			if not isinstance(raw_ids, list) or len(raw_ids) > 1000:
+				raise ValueError
+			ids = [int(pk) for pk in raw_ids]
+			notifications = notifications.filter(id__in=ids)
+		elif request.data['all'] not in (True, 'true', '1', 1):
+			raise ValueError
+	except (TypeError, ValueError):
+		return Response(
+			{'message': 'up_to must be an id, ids a list of at most 1000 ids, all true'},
+			status=status.HTTP_400_BAD_REQUEST
+		)
+
+	# queryset.update() skips auto_now, and updated_at feeds the list's Last-Modified
+	updated = notifications.update(is_read=True, updated_at=timezone.now())
+	unread = Notification.objects.filter(user=request.user, is_read=False).count()
+	return Response({'updated': updated, 'unread': unread}, status=status.HTTP_200_OK)
 
 # ChatMessage Views
 class ChatMessageListCreateView(generics.ListCreateAPIView):
 	serializer_class = ChatMessageSerializer
+	pagination_class = ChatHistoryPagination
 	permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
 
 	def get_queryset(self):
 		event_id = self.kwargs.get('event_id')
-		return ChatMessage.objects.filter(event_id=event_id).order_by('timestamp')
+		return ChatMessage.objects.filter(event_id=event_id).select_related('sender').order_by('timestamp', 'id')
+
+	def list(self, request, *args, **kwargs):
+		response = super().list(request, *args, **kwargs)
+		paginator, data = self.paginator, response.data
+		results, event_id = data['results'], self.kwargs.get('event_id')
+		# Archived messages all precede the hot ones, so the archive is only
+		# read when a window runs past the oldest hot message
+		if paginator.after is None:
+			if not data['has_more'] and len(results) < paginator.limit:
+				before = results[0]['id'] if results else paginator.before
+				older, data['has_more'] = archive.read_before(event_id, before, paginator.limit - len(results))
+				data['results'] = older + results
+			elif not data['has_more']:
+				# Hot rows filled the window; older history may still be archived
+				data['has_more'] = archive.holds_before(event_id, results[0]['id'])
+		elif not results and archive.holds(event_id, paginator.after):
+			newer, data['has_more'] = archive.read_after(event_id, paginator.after, paginator.limit)
+			if not data['has_more']:
+				room = paginator.limit - len(newer)
+				hot = list(self.get_queryset()[:room + 1])
+				data['has_more'] = len(hot) > room
+				newer += self.get_serializer(hot[:room], many=True).data
+			data['results'] = newer
+		return response
 
 	def perform_create(self, serializer):
 		event_id = self.kwargs.get('event_id')
@@ -199,7 +383,9 @@ class FavoriteListCreateView(generics.ListCreateAPIView):
 	permission_classes = [permissions.IsAuthenticated]
 
 	def get_queryset(self):
-		return Favorite.objects.filter(user=self.request.user)
+		return Favorite.objects.filter(user=self.request.user).select_related('user').prefetch_related(
+			Prefetch('event', queryset=Event.objects.with_related(EventSerializer.requested_fields(self.request)))
+		)
 
 	def perform_create(self, serializer):
 		# Prevent duplicate favorites
@@ -208,6 +394,24 @@ class FavoriteListCreateView(generics.ListCreateAPIView):
 			return
 		serializer.save(user=self.request.user)
 
+class FavoriteIdsView(ConditionalGetMixin, generics.ListAPIView):
+	"""
+	Ids of every event the user has favorited, for drawing hearts without
+	downloading /api/favorites/. Revalidate with If-None-Match.
+	"""
+	permission_classes = [permissions.IsAuthenticated]
+	pagination_class = None
+
+	def get_validators(self, request):
+		version, = get_versions([favorites_version_key(request.user.pk)])
+		return version, None
+
+	def get_queryset(self):
+		return Favorite.objects.filter(user=self.request.user).order_by('event_id').values_list('event_id', flat=True)
+
+	def list(self, request, *args, **kwargs):
+		return Response({'event_ids': list(self.get_queryset())})
+
 class FavoriteDetailView(generics.DestroyAPIView):
 	queryset = Favorite.objects.all()
 	serializer_class = FavoriteSerializer
@@ -219,13 +423,21 @@ class FavoriteDetailView(generics.DestroyAPIView):
 		return Favorite.objects.get(user=self.request.user, event_id=event_id)
 
 # Profile Views
-class ProfileDetailView(generics.RetrieveUpdateAPIView):
-	queryset = Profile.objects.all()
+class ProfileDetailView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
+	queryset = Profile.objects.select_related('user')
 	serializer_class = ProfileSerializer
 	permission_classes = [permissions.IsAuthenticated]
 
+	def get_validators(self, request):
+		updated_at = Profile.objects.filter(user=request.user).values_list('updated_at', flat=True).first()
+		if updated_at is None:
+			return None, None
+		user = request.user
+		# The nested user fields are part of the body but have no timestamp of their own
+		return f'{updated_at.isoformat()}:{user.username}:{user.email}:{user.get_full_name()}', updated_at
+
 	def get_object(self):
-		profile, created = Profile.objects.get_or_create(user=self.request.user)
+		profile, created = Profile.objects.select_related('user').get_or_create(user=self.request.user)
 		return profile
 
 # Booking Views
@@ -234,21 +446,103 @@ class BookingListCreateView(generics.ListCreateAPIView):
 	permission_classes = [permissions.IsAuthenticated]
 
 	def get_queryset(self):
-		return Booking.objects.filter(user=self.request.user)
+		return Booking.objects.filter(user=self.request.user).select_related('user').prefetch_related(
+			Prefetch('event', queryset=Event.objects.with_related(EventSerializer.requested_fields(self.request)))
+		)
 
 	def perform_create(self, serializer):
-		serializer.save(user=self.request.user)
+		bookings.create_booking(serializer, self.request.user)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def cancel_booking_view(request, pk):
+	"""
+	Cancel one of the user's bookings. The freed seats go to the
+	event's waitlist in FIFO order.
+	"""
+	try:
+		booking = Booking.objects.get(pk=pk, user=request.user)
+	except Booking.DoesNotExist:
+		return Response({'message': 'Booking not found'}, status=status.HTTP_404_NOT_FOUND)
+	if not bookings.cancel_booking(booking):
+		return Response({'message': 'Booking is already cancelled'}, status=status.HTTP_400_BAD_REQUEST)
+	return Response({'message': 'Booking cancelled'}, status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_booking_view(request):
+	"""
+	Book many seats at once: {"bookings": [{event_id, user_id?, ticket_count?}, ...],
+	"all_or_nothing": false}. Organizers may book other users onto their own
+	events. Answers with one result per item, in request order.
+	"""
+	envelope = BulkBookingSerializer(data=request.data)
+	envelope.is_valid(raise_exception=True)
+	results, items = {}, []
+	for index, data in enumerate(envelope.validated_data['bookings']):
+		item = BulkBookingItemSerializer(data=data)
+		if item.is_valid():
+			items.append({'index': index, 'user_id': request.user.id, **item.validated_data})
+		else:
+			results[index] = {'index': index, 'status': 'error', 'code': 'invalid', 'error': item.errors}
+	all_or_nothing = envelope.validated_data['all_or_nothing']
+	if items and not (all_or_nothing and results):
+		for result in bookings.bulk_book(request.user, items, all_or_nothing=all_or_nothing):
+			results[result['index']] = result
+	for index in range(len(envelope.validated_data['bookings'])):
+		results.setdefault(index, bookings.rolled_back_result(index))
+	ordered = [results[index] for index in sorted(results)]
+	booked = sum(1 for result in ordered if result['status'] == 'booked')
+	return Response(
+		{'booked': booked, 'failed': len(ordered) - booked, 'results': ordered},
+		status=status.HTTP_201_CREATED if booked else status.HTTP_400_BAD_REQUEST,
+	)
+
+# Waitlist Views
+class WaitlistView(APIView):
+	"""
+	The current user's place on an event's waitlist.
+	GET shows the entry, POST joins with {ticket_count} and also reports the
+	queue position, DELETE leaves.
+	"""
+	permission_classes = [permissions.IsAuthenticated]
+
+	def get_entry(self, request, event_id):
+		return WaitlistEntry.objects.filter(event_id=event_id, user=request.user).first()
+
+	def get(self, request, event_id):
+		entry = self.get_entry(request, event_id)
+		if entry is None:
+			return Response({'message': 'Not on the waitlist'}, status=status.HTTP_404_NOT_FOUND)
+		return Response(WaitlistEntrySerializer(entry).data)
+
+	def post(self, request, event_id):
+		event = generics.get_object_or_404(Event, pk=event_id)
+		serializer = WaitlistEntrySerializer(data=request.data)
+		serializer.is_valid(raise_exception=True)
+		entry = bookings.join_waitlist(event, request.user, serializer.validated_data.get('ticket_count', 1))
+		data = WaitlistEntrySerializer(entry).data
+		data['position'] = bookings.waitlist_position(entry)
+		return Response(data, status=status.HTTP_201_CREATED)
+
+	def delete(self, request, event_id):
+		deleted, _ = WaitlistEntry.objects.filter(event_id=event_id, user=request.user).delete()
+		if not deleted:
+			return Response({'message': 'Not on the waitlist'}, status=status.HTTP_404_NOT_FOUND)
+		return Response(status=status.HTTP_204_NO_CONTENT)
 
 # Review Views
 class ReviewListCreateView(generics.ListCreateAPIView):
 	serializer_class = ReviewSerializer
+	pagination_class = ReviewCursorPagination
 	permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 	def get_queryset(self):
 		event_id = self.kwargs.get('event_id')
+		queryset = Review.objects.select_related('user')
 		if event_id:
-			return Review.objects.filter(event_id=event_id)
-		return Review.objects.all()
+			return queryset.filter(event_id=event_id)
+		return queryset
 
 	def perform_create(self, serializer):
 		serializer.save(user=self.request.user)